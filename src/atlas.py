@@ -0,0 +1,238 @@
+"""Pack many small images into a few large surfaces.
+
+AtlasBuilder    collects images and packs them into an Atlas.
+Atlas           a set of packed pages and the regions of each image.
+Region          the page and source rectangle of one image in an Atlas.
+
+Blitting many regions of the same page, for example with
+``Surface.blits``, is much faster than blitting many separate surfaces. An
+Atlas can be saved to a directory and loaded again, so a game doesn't have
+to decode and pack its images every time it starts.
+"""
+
+import json
+import os
+
+from collections import namedtuple
+
+import pygame
+
+_INDEX = "atlas.json"
+
+class Region(namedtuple("Region", "page rect surface")):
+
+    """The location of one image in an Atlas.
+
+    *page* is the index of the page the image is on.
+
+    *rect* is a pygame Rect of the image on its page. Use it as the source
+    rectangle when blitting the page.
+
+    *surface* is a subsurface of the page containing just the image. It
+    shares its pixels with the page, so it doesn't take any extra memory.
+    """
+
+    __slots__ = ()
+
+class Atlas(object):
+
+    """A set of page surfaces with named regions.
+
+    *pages* is a sequence of pygame Surfaces.
+
+    *rects* is a mapping from image names to (page, x, y, width, height)
+    tuples.
+
+    Atlases are usually made by AtlasBuilder.build or Atlas.load.
+
+    Public Methods:
+
+        | blit, save, load
+
+    Instance variables:
+
+        | pages, names
+
+    """
+
+    def __init__(self, pages, rects):
+        self._pages = tuple(pages)
+        self._regions = {}
+        for name, (page, x, y, width, height) in rects.items():
+            rect = pygame.Rect(x, y, width, height)
+            self._regions[name] = Region(page, rect,
+                                         self._pages[page].subsurface(rect))
+
+    def __getitem__(self, name):
+        return self._regions[name]
+
+    def __contains__(self, name):
+        return name in self._regions
+
+    def __len__(self):
+        return len(self._regions)
+
+    def blit(self, surface, name, dest):
+        """Blit the image called *name* onto *surface* at *dest*.
+
+        Returns the Rect of the area that was changed.
+        """
+        region = self._regions[name]
+        return surface.blit(self._pages[region.page], dest, region.rect)
+
+    def save(self, path):
+        """Save the pages as PNG images and an index to the directory *path*.
+
+        The directory is created if it doesn't exist. The index is JSON, so
+        image names must be strings.
+        """
+        os.makedirs(path, exist_ok=True)
+        pages = []
+        for i, page in enumerate(self._pages):
+            filename = "page%d.png" % i
+            pygame.image.save(page, os.path.join(path, filename))
+            pages.append(filename)
+        rects = {name: [region.page, region.rect.x, region.rect.y,
+                        region.rect.width, region.rect.height]
+                 for name, region in self._regions.items()}
+        with open(os.path.join(path, _INDEX), "w") as f:
+            json.dump({"pages": pages, "rects": rects}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Load an Atlas that was saved to the directory *path*."""
+        with open(os.path.join(path, _INDEX)) as f:
+            index = json.load(f)
+        pages = [_convert(pygame.image.load(os.path.join(path, filename)))
+                 for filename in index["pages"]]
+        return cls(pages, index["rects"])
+
+    @property
+    def pages(self):
+        """A tuple of the page Surfaces."""
+        return self._pages
+
+    @property
+    def names(self):
+        """A tuple of the names of the images in the atlas."""
+        return tuple(self._regions)
+
+class AtlasBuilder(object):
+
+    """Collects images to pack into an Atlas.
+
+    Public Methods:
+
+        | add, build
+
+    """
+
+    def __init__(self):
+        self._images = {}
+
+    def add(self, name, image):
+        """Add an image called *name*.
+
+        *image* is a pygame Surface or the path of an image file.
+        """
+        if not isinstance(image, pygame.Surface):
+            image = pygame.image.load(image)
+        self._images[name] = image
+
+    def build(self, page_size=(1024, 1024), padding=1):
+        """Pack the images and return an Atlas.
+
+        *page_size* is a 2-tuple of integers representing the largest size of
+        a page. Each page is trimmed to the height it actually uses.
+
+        *padding* is the number of empty pixels left around every image, so
+        that scaled blits don't bleed into their neighbours.
+
+        Raises ValueError if an image is too big to fit on a page.
+        """
+        page_width, page_height = page_size
+        order = sorted(self._images, key=lambda name: (
+            -self._images[name].get_height(), -self._images[name].get_width()))
+
+        skylines = []
+        heights = []
+        rects = {}
+        for name in order:
+            width, height = self._images[name].get_size()
+            width += padding
+            height += padding
+            if width > page_width or height > page_height:
+                raise ValueError("image %r doesn't fit on a %dx%d page"
+                                 % (name, page_width, page_height))
+            for page, skyline in enumerate(skylines):
+                spot = _fit(skyline, width, height, page_width, page_height)
+                if spot is not None:
+                    break
+            else:
+                page = len(skylines)
+                skyline = [[0, 0, page_width]]
+                skylines.append(skyline)
+                heights.append(0)
+                spot = _fit(skyline, width, height, page_width, page_height)
+
+            x, y = _place(skyline, spot, width, height)
+            heights[page] = max(heights[page], y+height)
+            rects[name] = (page, x, y, width-padding, height-padding)
+
+        pages = [pygame.Surface((page_width, height), pygame.SRCALPHA)
+                 for height in heights]
+        for name, (page, x, y, width, height) in rects.items():
+            pages[page].blit(self._images[name], (x, y))
+        return Atlas([_convert(page) for page in pages], rects)
+
+def _convert(surface):
+    # Converting needs a display mode, which may not be set yet.
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha()
+
+def _fit(skyline, width, height, page_width, page_height):
+    # Return (index, y) of the lowest (then leftmost) spot on the skyline
+    # where a width x height rectangle fits, or None. The skyline is a list
+    # of [x, y, width] segments covering the page from left to right.
+    best = None
+    for i, (x, _, _) in enumerate(skyline):
+        if x + width > page_width:
+            break
+        y = 0
+        remaining = width
+        j = i
+        while remaining > 0:
+            segment_y, segment_width = skyline[j][1], skyline[j][2]
+            y = max(y, segment_y)
+            remaining -= segment_width
+            j += 1
+        if y + height <= page_height and (best is None or y < best[1]):
+            best = i, y
+    return best
+
+def _place(skyline, spot, width, height):
+    # Raise the skyline over a rectangle placed at spot and return its corner.
+    i, y = spot
+    x = skyline[i][0]
+    skyline.insert(i, [x, y+height, width])
+
+    j = i + 1
+    while j < len(skyline):
+        segment = skyline[j]
+        overlap = x + width - segment[0]
+        if overlap <= 0:
+            break
+        if overlap < segment[2]:
+            segment[0] += overlap
+            segment[2] -= overlap
+            break
+        del skyline[j]
+
+    j = 0
+    while j < len(skyline) - 1:
+        if skyline[j][1] == skyline[j+1][1]:
+            skyline[j][2] += skyline.pop(j+1)[2]
+        else:
+            j += 1
+    return x, y
@@ -0,0 +1,124 @@
+"""Sound playback with a sound cache and a pool of prioritized channels.
+
+SoundManager    preloads sounds and plays them on pooled mixer channels.
+"""
+
+import time
+
+import pygame
+
+class SoundManager(object):
+
+    """Preloads sounds and plays them without decoding on the hot path.
+
+    *channels* is an integer representing how many sounds can play at once.
+
+    Sounds are decoded once by load and cached by name, so play only has to
+    find a channel. When every channel is busy, the sound playing with the
+    lowest priority is stopped to make room, oldest first. A sound is never
+    stopped for one with a lower priority.
+
+    If the mixer couldn't be initialized (on a machine with no audio device,
+    for example), sounds are still loaded and play does nothing.
+
+    Usually you use the SoundManager of a Game through its ``sounds``
+    attribute.
+
+    Public Methods:
+
+        | load, play, stop, stop_all
+
+    Instance variables:
+
+        | enabled, sounds
+
+    """
+
+    def __init__(self, channels=16):
+        self._enabled = pygame.mixer.get_init() is not None
+        self._sounds = {}
+        self._channels = []
+        self._playing = []
+        if self._enabled:
+            pygame.mixer.set_num_channels(channels)
+            self._channels = [pygame.mixer.Channel(i)
+                              for i in range(channels)]
+            self._playing = [(0, 0.0)] * channels
+
+    def load(self, path, name=None, volume=None):
+        """Decode the sound file at *path* and cache it.
+
+        *name* is the name to play the sound by. It defaults to *path*.
+
+        *volume* is a number from 0.0 to 1.0 to set the sound's volume to.
+
+        Returns the pygame Sound.
+        """
+        if name is None:
+            name = path
+        if self._enabled:
+            sound = pygame.mixer.Sound(path)
+            if volume is not None:
+                sound.set_volume(volume)
+        else:
+            sound = None
+        self._sounds[name] = sound
+        return sound
+
+    def play(self, name, priority=0, loops=0, volume=None):
+        """Play the loaded sound called *name* and return its channel.
+
+        *priority* is a number representing how important the sound is. If
+        every channel is busy, it replaces the oldest sound with the lowest
+        priority, as long as that priority isn't higher than this one.
+
+        *loops* is the number of times to repeat the sound after it first
+        plays. -1 repeats it forever.
+
+        *volume* is a number from 0.0 to 1.0 to play the sound at.
+
+        Returns the pygame Channel the sound is playing on, or None if it
+        wasn't played. Raises KeyError if the sound hasn't been loaded.
+        """
+        sound = self._sounds[name]
+        if not self._enabled:
+            return None
+
+        index = None
+        for i, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                index = i
+                break
+        if index is None:
+            index = min(range(len(self._channels)),
+                        key=self._playing.__getitem__)
+            if self._playing[index][0] > priority:
+                return None
+
+        channel = self._channels[index]
+        channel.play(sound, loops)
+        channel.set_volume(1.0 if volume is None else volume)
+        self._playing[index] = (priority, time.perf_counter())
+        return channel
+
+    def stop(self, name):
+        """Stop every channel playing the sound called *name*."""
+        sound = self._sounds[name]
+        for channel in self._channels:
+            if channel.get_sound() is sound:
+                channel.stop()
+
+    def stop_all(self):
+        """Stop every sound."""
+        for channel in self._channels:
+            channel.stop()
+
+    @property
+    def enabled(self):
+        """A boolean that is True if the mixer is initialized."""
+        return self._enabled
+
+    @property
+    def sounds(self):
+        """A tuple of the names of the loaded sounds."""
+        return tuple(self._sounds)
@@ -0,0 +1,212 @@
+"""Entity storage with generational handles and dense component arrays.
+
+World       allocates entity handles and stores their components.
+
+A handle is an integer that packs an index and a generation. Destroyed
+indices are reused, but with a new generation, so a stale handle never
+refers to a new entity.
+"""
+
+from array import array
+
+SHAPE_NONE = 0
+SHAPE_CIRCLE = 1
+SHAPE_RECT = 2
+
+_INDEX_BITS = 32
+_INDEX_MASK = (1 << _INDEX_BITS) - 1
+
+class World(object):
+
+    """Stores entities and their position, shape and flags components.
+
+    Every entity has all three components. They are kept in parallel dense
+    arrays with no gaps: destroying an entity moves the last entity into its
+    slot. Systems iterate the arrays directly instead of looking objects up
+    one at a time.
+
+    The position is the upper-left corner of the entity's bounding box. The
+    shape is one of ``SHAPE_NONE``, ``SHAPE_CIRCLE`` or ``SHAPE_RECT`` and the
+    width and height of the bounding box. The flags are an unsigned integer
+    for your own use.
+
+    Public Methods:
+
+        | create, destroy, alive, position, set_position, shape, set_shape,
+        | flags, set_flags, hit_test
+
+    Instance variables:
+
+        | handles, x, y, kind, width, height, flag_array
+
+    """
+
+    def __init__(self):
+        self._generations = []
+        self._free = []
+        self._slots = []
+
+        self._handles = []
+        self._x = array("d")
+        self._y = array("d")
+        self._kind = array("B")
+        self._width = array("d")
+        self._height = array("d")
+        self._flags = array("L")
+
+    def create(self):
+        """Create an entity and return its handle."""
+        if self._free:
+            index = self._free.pop()
+        else:
+            index = len(self._generations)
+            self._generations.append(0)
+            self._slots.append(-1)
+        handle = self._generations[index] << _INDEX_BITS | index
+
+        self._slots[index] = len(self._handles)
+        self._handles.append(handle)
+        self._x.append(0)
+        self._y.append(0)
+        self._kind.append(SHAPE_NONE)
+        self._width.append(0)
+        self._height.append(0)
+        self._flags.append(0)
+        return handle
+
+    def destroy(self, handle):
+        """Destroy the entity with the given handle.
+
+        Raises KeyError if the entity doesn't exist.
+        """
+        slot = self._slot(handle)
+        last = len(self._handles) - 1
+        if slot != last:
+            moved = self._handles[last]
+            self._handles[slot] = moved
+            for column in (self._x, self._y, self._kind, self._width,
+                           self._height, self._flags):
+                column[slot] = column[last]
+            self._slots[moved & _INDEX_MASK] = slot
+        for column in (self._handles, self._x, self._y, self._kind,
+                       self._width, self._height, self._flags):
+            column.pop()
+
+        index = handle & _INDEX_MASK
+        self._slots[index] = -1
+        self._generations[index] += 1
+        self._free.append(index)
+
+    def alive(self, handle):
+        """Return True if the entity with the given handle exists."""
+        index = handle & _INDEX_MASK
+        return (index < len(self._generations) and
+                self._generations[index] == handle >> _INDEX_BITS and
+                self._slots[index] >= 0)
+
+    def position(self, handle):
+        """Return the position of an entity as a 2-tuple of numbers."""
+        slot = self._slot(handle)
+        return self._x[slot], self._y[slot]
+
+    def set_position(self, handle, position):
+        """Set the position of an entity to the 2-tuple *position*."""
+        slot = self._slot(handle)
+        self._x[slot], self._y[slot] = position
+
+    def shape(self, handle):
+        """Return the shape of an entity as a (kind, width, height) tuple."""
+        slot = self._slot(handle)
+        return self._kind[slot], self._width[slot], self._height[slot]
+
+    def set_shape(self, handle, kind, width=0, height=0):
+        """Set the shape of an entity.
+
+        *kind* is one of ``SHAPE_NONE``, ``SHAPE_CIRCLE`` or ``SHAPE_RECT``.
+
+        *width* and *height* are the size of the shape's bounding box.
+        """
+        slot = self._slot(handle)
+        self._kind[slot] = kind
+        self._width[slot] = width
+        self._height[slot] = height
+
+    def flags(self, handle):
+        """Return the flags of an entity."""
+        return self._flags[self._slot(handle)]
+
+    def set_flags(self, handle, flags):
+        """Set the flags of an entity to the unsigned integer *flags*."""
+        self._flags[self._slot(handle)] = flags
+
+    def hit_test(self, pos, test=None):
+        """Return a list of the handles of the entities that contain *pos*.
+
+        *pos* is a 2-tuple of numbers representing x and y coordinates.
+
+        *test* is an optional function that takes a handle and returns True if
+        that entity contains *pos*. It's called for entities whose shape is
+        ``SHAPE_NONE``; without it those entities are never hit.
+        """
+        px, py = pos
+        hits = []
+        for handle, kind, x, y, width, height in zip(
+                self._handles, self._kind, self._x, self._y, self._width,
+                self._height):
+            if kind == SHAPE_RECT:
+                if x <= px <= x+width and y <= py <= y+height:
+                    hits.append(handle)
+            elif kind == SHAPE_CIRCLE:
+                radius = width / 2
+                dx, dy = x+radius-px, y+radius-py
+                if dx*dx + dy*dy <= radius*radius:
+                    hits.append(handle)
+            elif test is not None and test(handle):
+                hits.append(handle)
+        return hits
+
+    def _slot(self, handle):
+        if not self.alive(handle):
+            raise KeyError(handle)
+        return self._slots[handle & _INDEX_MASK]
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __contains__(self, handle):
+        return self.alive(handle)
+
+    @property
+    def handles(self):
+        """A tuple of the handles of every entity, in dense array order."""
+        return tuple(self._handles)
+
+    @property
+    def x(self):
+        """The dense array of x coordinates, in the same order as handles."""
+        return self._x
+
+    @property
+    def y(self):
+        """The dense array of y coordinates, in the same order as handles."""
+        return self._y
+
+    @property
+    def kind(self):
+        """The dense array of shape kinds, in the same order as handles."""
+        return self._kind
+
+    @property
+    def width(self):
+        """The dense array of shape widths, in the same order as handles."""
+        return self._width
+
+    @property
+    def height(self):
+        """The dense array of shape heights, in the same order as handles."""
+        return self._height
+
+    @property
+    def flag_array(self):
+        """The dense array of flags, in the same order as handles."""
+        return self._flags
@@ -7,12 +7,54 @@ GameObject  A simple class to provide a more intuitive approach to gamedev.
 #TODO: Create a MonoBehaviour-esque class to provide more flexibility (and also
 #      so I'm not redefining and redocumenting the same ten methods twice.
 
+import bisect
+import gc
 import pygame
 import sys
+import time
+import warnings
+import weakref
+
+from collections import deque
 
 from pygame.time import Clock
 from pygame.event import Event
 
+from audio import SoundManager
+from entities import World, SHAPE_NONE, SHAPE_CIRCLE, SHAPE_RECT
+
+# A box that contains nothing and leaves any box it's combined with unchanged.
+_EMPTY = (float("inf"), float("inf"), float("-inf"), float("-inf"))
+
+_MOUSE_EVENTS = frozenset((pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP,
+                           pygame.MOUSEBUTTONDOWN))
+
+def _gc_timer(timing):
+    # A gc callback that adds the duration of every collection to timing[1].
+    def callback(phase, info):
+        if phase == "start":
+            timing[0] = time.perf_counter()
+        else:
+            timing[1] += time.perf_counter() - timing[0]
+    return callback
+
+def _release_gc(callback, manual):
+    # Undo a Game's changes to the garbage collector. This is the game's
+    # finalizer, so it only holds on to the callback and the manual flag.
+    if callback in gc.callbacks:
+        gc.callbacks.remove(callback)
+    if manual[0]:
+        manual[0] = False
+        gc.enable()
+
+class _HeldKeys(set):
+    # The keys held down in a simulated step, indexed like the sequence
+    # returned by pygame.key.get_pressed.
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return key in self
+
 class Game(object):
     
     """A class that handles pygame events, input, and mouse-collision.
@@ -27,40 +69,150 @@ class Game(object):
     see :ref:`Pygame Display Mode Flags`. For more information on how flags
     work, see :doc:`the Flags tutorial <flag-tut>`.
 
+    *entities* is a boolean. If it's True, GameObjects are stored in an
+    :class:`entities.World`: their ids are generational handles that are
+    reused after an object is destroyed, and their screen positions and
+    shapes are mirrored into dense arrays that mouse hit-testing iterates.
+
+    *render_scale* is a number that, if given, makes ``screen`` an offscreen
+    Surface that is *render_scale* times the size of the window. Every frame
+    it's scaled up to the window and the display is flipped. GameObjects and
+    mouse events stay in window coordinates whatever the scale, so use
+    :meth:`to_screen` when drawing onto ``screen``. See
+    :meth:`adapt_render_scale` for changing the scale automatically.
+
+    *smooth* is a boolean. If it's True, the offscreen Surface is scaled with
+    ``pygame.transform.smoothscale`` instead of ``pygame.transform.scale``.
+
+    *frame_budget* is a number of seconds. If it's given, GameObjects with a
+    negative ``priority`` are only updated while the frame is within its
+    budget. The ones that miss out are updated first on later frames.
+
+    *sound_buffer* is an integer representing the size of the mixer's buffer
+    in samples. Smaller buffers play sounds with less delay. The mixer is
+    pre-initialized with it and *sound_format* before pygame is initialized.
+    If it's None, the mixer isn't pre-initialized, so it keeps whatever you
+    gave to ``pygame.mixer.pre_init`` yourself. Either way, a mixer that is
+    already initialized keeps its settings, with a warning if they don't
+    match *sound_format*.
+
+    *sound_format* is a (frequency, size, channels) tuple like the one
+    returned by ``pygame.mixer.get_init``. It's only used with
+    *sound_buffer*.
+
+    *sound_channels* is an integer representing how many sounds ``sounds``
+    can play at once.
+
+    *gc_mode* is either ``"auto"`` or ``"manual"``. See ``gc_mode``.
+
+    *gc_budget* is a number of seconds. See ``gc_budget``.
+
+    *pick_topmost* is a boolean. See ``pick_topmost``.
+
     Public Methods:
 
-        | main, quit, on_focus, on_key_down, on_key_up, on_mouse_move,
-        | on_mouse_up, on_mouse_down, on_resize, update, add_object,
-        | destroy_object, key_is_pressed
+        | main, step, reset, observe, quit, on_focus, on_key_down, on_key_up,
+        | on_mouse_move, on_mouse_up, on_mouse_down, on_resize, update,
+        | add_object, destroy_object, key_is_pressed, key_was_pressed,
+        | key_was_released, subscribe_key, unsubscribe_key,
+        | subscribe_joy_button, unsubscribe_joy_button, adapt_render_scale,
+        | on_rescale, to_screen, freeze_gc, close
 
     Instance variables:
 
-        | screen
+        | screen, world, render_scale, frame_time, frame_budget, shed_updates,
+        | sounds, gc_mode, gc_budget, frame_allocations, gc_pause,
+        | pick_topmost
 
     """
 
-    def __init__(self, resolution, title, flags=0, depth=0):
+    def __init__(self, resolution, title, flags=0, depth=0, entities=False,
+                 render_scale=None, smooth=False, frame_budget=None,
+                 sound_buffer=512, sound_format=(44100, -16, 2),
+                 sound_channels=16, gc_mode="auto", gc_budget=None,
+                 pick_topmost=False):
+        if sound_buffer is not None:
+            current = pygame.mixer.get_init()
+            if current is not None and current != tuple(sound_format):
+                warnings.warn("the mixer is already initialized as %r, so "
+                              "sound_format and sound_buffer are ignored"
+                              % (current,), stacklevel=2)
+            # pre_init resets every setting it isn't given to its default,
+            # so they're all passed.
+            frequency, size, channels = sound_format
+            pygame.mixer.pre_init(frequency, size, channels, sound_buffer)
         pygame.init() 
-        self._screen = pygame.display.set_mode(resolution, flags, depth)
+        self._display = pygame.display.set_mode(resolution, flags, depth)
+        self._screen = self._display
         pygame.display.set_caption(title)
 
+        self._render_scale = None
+        self._smooth = smooth
+        self._adaptive = None
+        self._frame_time = 0.0
+        self._frames_since_rescale = 0
+        if render_scale is not None:
+            self.render_scale = render_scale
+
         self._cur_id = 0
         self._objects = {}
+        self._updates = {}
+        self._deferred = {}
+        self._update_pass = 0
+        self._frame_budget = frame_budget
+        self._shed_updates = 0
+        self._roots = {}
         self._contains_mouse = {}
+        self._z_seq = 0
+        self._pick_topmost = False
+        self._z_keys = []
+        self._z_objects = []
+        self._world = World() if entities else None
+        self._sounds = None
+        self._sound_channels = sound_channels
+
+        # The gc callback only holds on to this list, not to the game.
+        self._gc_timing = [0.0, 0.0]
+        self._gc_manual = [False]
+        callback = _gc_timer(self._gc_timing)
+        gc.callbacks.append(callback)
+        self._gc_finalizer = weakref.finalize(self, _release_gc, callback,
+                                              self._gc_manual)
+        self._gc_mode = "auto"
+        self._gc_budget = gc_budget
+        self._gc_long_lived = 0
+        self._gc_pending = 0
+        self._frame_allocations = 0
+        self._gc_pause = 0.0
+        self.gc_mode = gc_mode
+        self.pick_topmost = pick_topmost
+        self._stale = {} if entities else None
         self._clicked = {}
 
         self._keys_pressed = pygame.key.get_pressed()
+        self._keys_down = set()
+        self._keys_up = set()
+
+        # Input state built from the events passed to step, for simulations.
+        self._simulated = False
+        self._held_keys = _HeldKeys()
+        self._mouse_pos = (0, 0)
+        self._mouse_buttons = [False, False, False]
+
+        self._key_subscribers = {}
+        self._joy_subscribers = {}
 
         self._handle = {pygame.QUIT:            self.quit,
                         pygame.ACTIVEEVENT:     self.on_focus,
-                        pygame.KEYDOWN:         self.on_key_down,
-                        pygame.KEYUP:           self.on_key_up,
+                        pygame.KEYDOWN:         self._on_key_down,
+                        pygame.KEYUP:           self._on_key_up,
                         pygame.MOUSEMOTION:     self.on_mouse_move,
                         pygame.MOUSEBUTTONUP:   self.on_mouse_up,
                         pygame.JOYAXISMOTION:   self.on_joy_move,
                         pygame.JOYBALLMOTION:   self.on_joy_ball_move,
                         pygame.JOYHATMOTION:    self.on_joy_hat_move,
-                        pygame.JOYBUTTONDOWN:   self.on_joy_button_down,
+                        pygame.JOYBUTTONDOWN:   self._on_joy_button_down,
+                        pygame.JOYBUTTONUP:     self._on_joy_button_up,
                         pygame.MOUSEBUTTONDOWN: self.on_mouse_down,
                         pygame.VIDEORESIZE:     self.on_resize,
                         pygame.VIDEOEXPOSE:     self.on_expose,
@@ -69,22 +221,322 @@ class Game(object):
     def main(self):
         """The main loop. Call this to run the game."""
         while True:
-            for event in pygame.event.get():
-                self._handle[event.type](event)
-
+            self.step()
+
+    def step(self, events=None):
+        """Run a single frame of the game.
+
+        *events* is an iterable of pygame events to handle this frame. If it's
+        None, the events are taken from ``pygame.event.get()`` and the
+        keyboard and mouse are polled as usual. Headless simulations can pass
+        their own events instead: then key_is_pressed and the mouse state
+        given to on_mouse_stay are built from those events alone, as if they
+        were the only input the game ever received.
+
+        Handles the events, calls on_mouse_stay on every object containing the
+        mouse, and then calls update on the game and on every object. With
+        ``entities``, the ``world`` arrays are brought up to date before and
+        after the updates. If the
+        game has a ``render_scale``, the offscreen ``screen`` is then scaled
+        up to the window and the display is flipped.
+        """
+        start = time.perf_counter()
+        scaled = self._render_scale is not None
+        allocations = gc.get_count()[0]
+        self._gc_timing[1] = 0.0
+
+        self._keys_down.clear()
+        self._keys_up.clear()
+        simulated = events is not None
+        if not simulated:
+            events = pygame.event.get()
+        elif not self._simulated:
+            self._reset_simulated_input()
+        self._simulated = simulated
+
+        rel = (0, 0)
+        for event in events:
+            if simulated:
+                rel = self._simulate_input(event, rel)
+            self._handle[event.type](event)
+
+        if simulated:
+            self._keys_pressed = self._held_keys
+            buttons = tuple(self._mouse_buttons)
+            pos = self._mouse_pos
+        else:
             self._keys_pressed = pygame.key.get_pressed()
             buttons = pygame.mouse.get_pressed()
             pos = pygame.mouse.get_pos()
             rel = pygame.mouse.get_rel()
 
+        if self._contains_mouse:
             event = Event(pygame.MOUSEMOTION, buttons=buttons,
                           pos=pos, rel=rel)
             for obj in self._contains_mouse.values():
                 obj.on_mouse_stay(event)
 
-            self.update()
-            for obj in self._objects.values():
+        if self._stale:
+            self._sync_world()
+        self.update()
+        for obj in self._updates.values():
+            obj.update()
+        if self._deferred:
+            self._update_deferred(start)
+        else:
+            self._shed_updates = 0
+        if self._stale:
+            self._sync_world()
+
+        if scaled:
+            self._present(start)
+
+        # gc's generation 0 count goes up by one for every container object
+        # allocated and down by one for every one freed.
+        self._frame_allocations = max(0, gc.get_count()[0] - allocations)
+        if self._gc_mode == "manual":
+            self._collect_idle(start)
+        self._gc_pause = self._gc_timing[1]
+
+    def _simulate_input(self, event, rel):
+        # Update the simulated keyboard and mouse from one event and return
+        # the mouse's movement so far this frame.
+        if event.type == pygame.KEYDOWN:
+            self._held_keys.add(event.key)
+        elif event.type == pygame.KEYUP:
+            self._held_keys.discard(event.key)
+        elif event.type in _MOUSE_EVENTS:
+            self._mouse_pos = event.pos
+            if event.type == pygame.MOUSEMOTION:
+                rel = rel[0] + event.rel[0], rel[1] + event.rel[1]
+            elif 1 <= event.button <= 3:
+                self._mouse_buttons[event.button-1] = (
+                    event.type == pygame.MOUSEBUTTONDOWN)
+        return rel
+
+    def _reset_simulated_input(self):
+        self._held_keys.clear()
+        self._mouse_pos = (0, 0)
+        self._mouse_buttons[:] = False, False, False
+
+    def _collect_idle(self, start):
+        # Collect the generations that are over their thresholds, but only
+        # touch the oldest generation when the frame has time to spare. If
+        # the frame is already over budget, wait until garbage has piled up
+        # well past the threshold.
+        count0, count1, count2 = gc.get_count()
+        threshold0, threshold1, threshold2 = gc.get_threshold()
+        budget = self._gc_budget
+        if budget is None:
+            budget = self._frame_budget
+        idle = False
+        if budget is not None:
+            idle = time.perf_counter() - start < budget
+            if not idle:
+                threshold0 *= 10
+        if count0 < threshold0:
+            return
+        generation = 0
+        if count1 >= threshold1:
+            generation = 1
+            if idle and count2 >= threshold2 and self._long_lived_pending():
+                generation = 2
+        collected = gc.collect(generation)
+
+        # Counting the oldest generation means walking all of it, so its size
+        # is estimated instead: whatever was allocated and not collected is
+        # assumed to survive into it.
+        if generation == 2:
+            self._gc_long_lived = max(0, self._gc_long_lived +
+                                      self._gc_pending - collected)
+            self._gc_pending = 0
+        else:
+            self._gc_pending += max(0, count0 - collected)
+
+    def _long_lived_pending(self):
+        # Like CPython, only collect the oldest generation once the objects
+        # that reached it since the last full collection are more than a
+        # quarter of the ones that survived that collection. This keeps full
+        # collections from going quadratic as the heap grows.
+        return self._gc_pending > self._gc_long_lived / 4
+
+    def freeze_gc(self):
+        """Move every object that exists now into gc's permanent generation.
+
+        Call this once the game has finished loading. The objects created so
+        far are never examined by the garbage collector again, which makes
+        every later collection cheaper.
+        """
+        gc.collect()
+        gc.freeze()
+        self._gc_long_lived = 0
+        self._gc_pending = 0
+
+    def close(self):
+        """Give the garbage collector back to Python.
+
+        Removes the callback that measures ``gc_pause`` and, if ``gc_mode``
+        is ``"manual"``, turns automatic collection back on. This also
+        happens when the game is garbage collected or the interpreter exits,
+        so you only need to call it if the process carries on without the
+        game.
+        """
+        self._gc_mode = "auto"
+        self._gc_finalizer()
+
+    def _update_deferred(self, start):
+        # Low-priority objects wait in one queue per priority, and the most
+        # important queues are served first. Each queue is round-robin, so an
+        # object that was skipped is at the front of the line next frame.
+        #
+        # An update may destroy objects or change their priority, so the
+        # next queue is looked up after each one is served, and each object
+        # is stamped with the pass it was served in. Served objects go to the
+        # back, so a queue is done once the object at its front has already
+        # been served.
+        budget = self._frame_budget
+        shed = 0
+        self._update_pass += 1
+        served = self._update_pass
+        priority = 0
+        while True:
+            lower = [p for p in self._deferred if p < priority]
+            if not lower:
+                break
+            priority = max(lower)
+            queue = self._deferred[priority]
+            if shed:
+                shed += len(queue)
+                continue
+            while queue and queue[0]._served != served:
+                if (budget is not None and
+                        time.perf_counter() - start > budget):
+                    shed = sum(1 for obj in queue if obj._served != served)
+                    break
+                obj = queue.popleft()
+                queue.append(obj)
+                obj._served = served
                 obj.update()
+        self._shed_updates = shed
+
+    def _set_priority(self, other, old, new):
+        if old < 0:
+            queue = self._deferred[old]
+            queue.remove(other)
+            if not queue: del self._deferred[old]
+        else:
+            del self._updates[other.ID]
+        if new < 0:
+            self._deferred.setdefault(new, deque()).append(other)
+        else:
+            self._updates[other.ID] = other
+
+    def _present(self, start):
+        size = self._display.get_size()
+        if self._screen.get_size() == size:
+            self._display.blit(self._screen, (0, 0))
+        elif self._smooth:
+            pygame.transform.smoothscale(self._screen, size, self._display)
+        else:
+            pygame.transform.scale(self._screen, size, self._display)
+        pygame.display.flip()
+
+        # Keep a moving average of the frame time so a single slow frame
+        # doesn't change the resolution.
+        frame_time = time.perf_counter() - start
+        if self._frame_time:
+            self._frame_time += (frame_time - self._frame_time) / 10
+        else:
+            self._frame_time = frame_time
+        self._frames_since_rescale += 1
+
+        if self._adaptive is None or self._frames_since_rescale < 30:
+            return
+        budget, min_scale, max_scale, scale_step = self._adaptive
+        scale = self._render_scale
+        if self._frame_time > budget and scale > min_scale:
+            scale = max(min_scale, round(scale - scale_step, 6))
+        elif self._frame_time < budget * 0.75 and scale < max_scale:
+            scale = min(max_scale, round(scale + scale_step, 6))
+        else:
+            return
+        self.render_scale = scale
+        self.on_rescale(scale)
+
+    def adapt_render_scale(self, fps, min_scale=0.5, max_scale=1.0,
+                           scale_step=0.1):
+        """Change ``render_scale`` automatically to hold a frame rate.
+
+        *fps* is the number of frames per second to aim for. If the average
+        frame takes longer than that allows, the scale is lowered by
+        *scale_step*; if frames are comfortably faster, it's raised again. If
+        *fps* is None, the scale stops changing.
+
+        *min_scale* and *max_scale* are numbers that limit the scale.
+
+        The scale changes at most once every 30 frames. on_rescale is called
+        after every change.
+        """
+        if fps is None:
+            self._adaptive = None
+            return
+        self._adaptive = 1 / fps, min_scale, max_scale, scale_step
+        if self._render_scale is None:
+            self.render_scale = max_scale
+
+    def on_rescale(self, scale):
+        """This method is called when ``render_scale`` is changed automatically.
+
+        *scale* is the new render scale. ``screen`` is a new, blank Surface,
+        so everything needs to be redrawn at the new scale.
+
+        This method is not predefined.
+        """
+        pass
+
+    def to_screen(self, pos):
+        """Return *pos* in the coordinates of ``screen``.
+
+        *pos* is a 2-tuple of numbers in window coordinates, like the
+        positions of GameObjects and mouse events. It can also be a size.
+
+        Returns a 2-tuple of integers. Without a ``render_scale`` they're the
+        same as *pos*.
+        """
+        scale = self._render_scale
+        if scale is None:
+            return int(pos[0]), int(pos[1])
+        return int(pos[0]*scale), int(pos[1]*scale)
+
+    def reset(self):
+        """Return the game to an empty state.
+
+        This method is predefined to destroy every GameObject and clear the
+        input state. Redefine it to rebuild your starting scene, calling
+        super().reset() at the top of your function.
+        """
+        for obj_id in tuple(self._roots):
+            self.destroy_object(obj_id)
+        self._contains_mouse.clear()
+        self._clicked.clear()
+        self._keys_down.clear()
+        self._keys_up.clear()
+        if self._simulated:
+            self._reset_simulated_input()
+        else:
+            self._keys_pressed = pygame.key.get_pressed()
+
+    def observe(self):
+        """Return an observation of the current state of the game.
+
+        The observation should be a flat sequence of numbers. It's used by
+        :class:`vecgame.VecGame` to fill its shared observation buffer after
+        every step and reset.
+
+        This method is predefined to return an empty observation. Redefine it
+        to describe your game.
+        """
+        return ()
 
     def quit(self, event):
         """The method called when the exit button is pressed.
@@ -181,19 +633,116 @@ class Game(object):
         redefining the function.
         """
         #TODO: Add support for sleeping vs awake objects
-        for ID, obj in self._objects.items():
-            mouse_is_colliding = event.pos in obj
-            if not obj._contains_mouse and mouse_is_colliding:
-                self._contains_mouse[ID] = obj
-                obj._contains_mouse = True
-                obj.on_mouse_enter(event)
-            elif obj._contains_mouse and not mouse_is_colliding:
+        self._hover(event)
+
+        for obj in self._clicked.values():
+            obj.on_mouse_drag(event)
+
+    def _hover(self, event):
+        # Send on_mouse_exit and on_mouse_enter to the objects the mouse
+        # left and entered, so that _contains_mouse matches event.pos.
+        colliding = self._collide(event.pos)
+        for ID, obj in tuple(self._contains_mouse.items()):
+            if ID not in colliding:
                 del self._contains_mouse[ID]
                 obj._contains_mouse = False
                 obj.on_mouse_exit(event)
+        for ID, obj in colliding.items():
+            if not obj._contains_mouse:
+                self._contains_mouse[ID] = obj
+                obj._contains_mouse = True
+                obj.on_mouse_enter(event)
 
-        for obj in self._clicked.values():
-            obj.on_mouse_drag(event)
+    def _collide(self, pos):
+        if self._world is not None:
+            colliding = self._collide_entities(pos)
+            if self._pick_topmost and len(colliding) > 1:
+                colliding = self._pick_topmost_hits(colliding)
+            return colliding
+        if self._pick_topmost:
+            return self._collide_topmost(pos)
+        return self._collide_tree(pos)
+
+    def _collide_tree(self, pos):
+        # Walk the scene graph from the top-level objects, skipping any
+        # subtree whose cached bounding box doesn't contain pos.
+        x, y = pos
+        colliding = {}
+        stack = list(self._roots.values())
+        while stack:
+            obj = stack.pop()
+            box = obj.subtree_bounds
+            if box is not None:
+                left, top, right, bottom = box
+                if not (left <= x <= right and top <= y <= bottom):
+                    continue
+            if pos in obj:
+                colliding[obj.ID] = obj
+            stack.extend(obj._children.values())
+        return colliding
+
+    def _collide_topmost(self, pos):
+        # Objects are kept sorted from the top down, so the walk can stop at
+        # the first hit that blocks input. An object's own box is checked
+        # before its __contains__ is called.
+        x, y = pos
+        colliding = {}
+        for obj in self._z_objects:
+            box = obj._own_bounds()
+            if box is not None:
+                left, top, right, bottom = box
+                if not (left <= x <= right and top <= y <= bottom):
+                    continue
+            if pos in obj:
+                colliding[obj.ID] = obj
+                if obj._blocks_input:
+                    break
+        return colliding
+
+    def _pick_topmost_hits(self, colliding):
+        # The world tests every entity in one pass anyway, so its hits are
+        # sorted afterwards. Go from the top down and stop at the first hit
+        # that blocks input.
+        picked = {}
+        for obj in sorted(colliding.values(), key=self._z_key):
+            picked[obj.ID] = obj
+            if obj._blocks_input:
+                break
+        return picked
+
+    def _z_key(self, other):
+        # Higher z first; among equal z, the most recently added first.
+        return -other._z, -other._z_seq
+
+    def _stack(self, other):
+        key = self._z_key(other)
+        i = bisect.bisect_left(self._z_keys, key)
+        self._z_keys.insert(i, key)
+        self._z_objects.insert(i, other)
+
+    def _unstack(self, other):
+        i = bisect.bisect_left(self._z_keys, self._z_key(other))
+        del self._z_keys[i]
+        del self._z_objects[i]
+
+    def _sync_world(self):
+        # Copy the objects that moved or changed shape into the world's
+        # arrays.
+        world = self._world
+        for obj_id, obj in self._stale.items():
+            world.set_position(obj_id, obj.world_position)
+            world.set_shape(obj_id, *obj._shape())
+        self._stale.clear()
+
+    def _collide_entities(self, pos):
+        # Bring the world up to date, then let it test every entity in one
+        # pass.
+        if self._stale:
+            self._sync_world()
+        world = self._world
+        objects = self._objects
+        hits = world.hit_test(pos, lambda obj_id: pos in objects[obj_id])
+        return {obj_id: objects[obj_id] for obj_id in hits}
 
     def on_mouse_up(self, event):
         """This method is called whenever a mouse button is released.
@@ -241,6 +790,11 @@ class Game(object):
         super().on_mouse_up(event) at the top of your function.
         """
         if event.button == 1:
+            # Objects may have moved or been restacked since the mouse last
+            # moved, so the topmost object is picked again, and entered or
+            # exited, before it's clicked.
+            if self._pick_topmost:
+                self._hover(event)
             for obj in self._contains_mouse.values():
                 obj.on_mouse_down(event)
             self._clicked.update(self._contains_mouse)
@@ -257,6 +811,9 @@ class Game(object):
     def on_joy_button_down(self, event):
         pass
 
+    def on_joy_button_up(self, event):
+        pass
+
     def on_resize(self, event):
         """This method is called whenever the window is resized.
         
@@ -292,20 +849,48 @@ class Game(object):
         # TODO: provide full documentation for the functions and attributes
         #       to implement if not GameObject
 
-        obj_id = self._cur_id
+        if self._world is None:
+            obj_id = self._cur_id
+            self._cur_id += 1
+        else:
+            obj_id = self._world.create()
+            self._stale[obj_id] = other
         self._objects[obj_id] = other
-        self._cur_id += 1
+        self._roots[obj_id] = other
+        self._updates[obj_id] = other
+        other._z_seq = self._z_seq
+        self._z_seq += 1
+        if self._pick_topmost:
+            self._stack(other)
         return obj_id
 
     def destroy_object(self, _id):
         """Destroys the object with the given id from the game.
 
+        The object's children are destroyed along with it.
+
         Note: Does not "undraw" the object. This must be done manually (for now)
         """
+        obj = self._objects[_id]
+        for child in tuple(obj._children.values()):
+            self.destroy_object(child.ID)
+        obj.parent = None
+        del self._roots[_id]
         del self._objects[_id]
-        for name in ("contains_mouse", "clicked"):
-            D = getattr(self, "_"+name)
-            if _id in D: del D[_id]
+        if obj.priority < 0:
+            self._set_priority(obj, obj.priority, 0)
+        del self._updates[_id]
+        if self._pick_topmost:
+            self._unstack(obj)
+        self._contains_mouse.pop(_id, None)
+        self._clicked.pop(_id, None)
+        if self._world is not None:
+            self._world.destroy(_id)
+            self._stale.pop(_id, None)
+        for key in tuple(obj._keys):
+            self.unsubscribe_key(obj, key)
+        for joy, button in tuple(obj._joy_buttons):
+            self.unsubscribe_joy_button(obj, button, joy)
 
     def key_is_pressed(self, key):
         """Return True if a key is pressed, False if not.
@@ -315,11 +900,284 @@ class Game(object):
         """
         return self._keys_pressed[key]
 
+    def key_was_pressed(self, key):
+        """Return True if a key went down this frame, False if not.
+
+        *key* is pygame keycode.
+        For a full list of keycodes, see :ref:`Pygame Keycodes`.
+        """
+        return key in self._keys_down
+
+    def key_was_released(self, key):
+        """Return True if a key went up this frame, False if not.
+
+        *key* is pygame keycode.
+        For a full list of keycodes, see :ref:`Pygame Keycodes`.
+        """
+        return key in self._keys_up
+
+    def subscribe_key(self, other, key):
+        """Deliver ``KEYDOWN`` and ``KEYUP`` events for *key* to *other*.
+
+        *other* is a GameObject that is part of this game. Its on_key_down and
+        on_key_up methods are called only for the keys it is subscribed to.
+
+        *key* is pygame keycode.
+        For a full list of keycodes, see :ref:`Pygame Keycodes`.
+        """
+        self._key_subscribers.setdefault(key, {})[other.ID] = other
+        other._keys.add(key)
+
+    def unsubscribe_key(self, other, key):
+        """Stop delivering events for *key* to the GameObject *other*."""
+        subscribers = self._key_subscribers.get(key)
+        if subscribers is not None:
+            subscribers.pop(other.ID, None)
+            if not subscribers: del self._key_subscribers[key]
+        other._keys.discard(key)
+
+    def subscribe_joy_button(self, other, button, joy=None):
+        """Deliver ``JOYBUTTONDOWN`` and ``JOYBUTTONUP`` events to *other*.
+
+        *other* is a GameObject that is part of this game. Its
+        on_joy_button_down and on_joy_button_up methods are called only for
+        the joystick buttons it is subscribed to.
+
+        *button* is an integer representing the index of a joystick button.
+
+        *joy* is an integer representing the id of the joystick. If it's
+        None, *button* is delivered from every joystick.
+        """
+        key = joy, button
+        self._joy_subscribers.setdefault(key, {})[other.ID] = other
+        other._joy_buttons.add(key)
+
+    def unsubscribe_joy_button(self, other, button, joy=None):
+        """Stop delivering events for *button* to the GameObject *other*.
+
+        *joy* must be the same joystick id *button* was subscribed with.
+        """
+        key = joy, button
+        subscribers = self._joy_subscribers.get(key)
+        if subscribers is not None:
+            subscribers.pop(other.ID, None)
+            if not subscribers: del self._joy_subscribers[key]
+        other._joy_buttons.discard(key)
+
+    def _joy_button_subscribers(self, event):
+        # Subscribers to this joystick's button, then to the button on any
+        # joystick. An object subscribed both ways only gets the event once.
+        subscribers = dict(self._joy_subscribers.get((None, event.button), ()))
+        subscribers.update(
+            self._joy_subscribers.get((event.joy, event.button), ()))
+        return subscribers.values()
+
+    def _on_key_down(self, event):
+        self._keys_down.add(event.key)
+        subscribers = self._key_subscribers.get(event.key)
+        if subscribers:
+            for obj in tuple(subscribers.values()):
+                obj.on_key_down(event)
+        self.on_key_down(event)
+
+    def _on_key_up(self, event):
+        self._keys_up.add(event.key)
+        subscribers = self._key_subscribers.get(event.key)
+        if subscribers:
+            for obj in tuple(subscribers.values()):
+                obj.on_key_up(event)
+        self.on_key_up(event)
+
+    def _on_joy_button_down(self, event):
+        if self._joy_subscribers:
+            for obj in self._joy_button_subscribers(event):
+                obj.on_joy_button_down(event)
+        self.on_joy_button_down(event)
+
+    def _on_joy_button_up(self, event):
+        if self._joy_subscribers:
+            for obj in self._joy_button_subscribers(event):
+                obj.on_joy_button_up(event)
+        self.on_joy_button_up(event)
+
     @property
     def screen(self):
-        """The pygame Surface used to draw and blit images to the screen."""
+        """The pygame Surface used to draw and blit images to the screen.
+
+        If the game has a ``render_scale``, this is an offscreen Surface that
+        is scaled up to the window every frame. Its coordinates are the
+        window's times the scale; see to_screen.
+        """
         return self._screen
 
+    @property
+    def render_scale(self):
+        """The size of ``screen`` relative to the window, or None.
+
+        None means ``screen`` is the window's own Surface. Setting a number
+        replaces ``screen`` with a blank offscreen Surface of that scale.
+        """
+        return self._render_scale
+    @render_scale.setter
+    def render_scale(self, other):
+        self._render_scale = other
+        self._frames_since_rescale = 0
+        self._frame_time = 0.0
+        if other is None:
+            self._screen = self._display
+            return
+        width, height = self._display.get_size()
+        size = max(1, int(width*other)), max(1, int(height*other))
+        self._screen = pygame.Surface(size, 0, self._display)
+
+    @property
+    def frame_budget(self):
+        """The number of seconds a frame may take before updates are shed.
+
+        Only GameObjects with a negative ``priority`` are ever skipped. None
+        means every object is updated every frame.
+
+        This attribute is mutable.
+        """
+        return self._frame_budget
+    @frame_budget.setter
+    def frame_budget(self, other):
+        self._frame_budget = other
+
+    @property
+    def gc_mode(self):
+        """How garbage collection is scheduled, ``"auto"`` or ``"manual"``.
+
+        ``"auto"`` leaves Python's garbage collector alone. ``"manual"``
+        disables automatic collection, which can pause the game in the middle
+        of a frame, and instead collects at the end of frames. The oldest
+        generation is only collected in frames that finish within
+        ``gc_budget``, and only once it has grown by a quarter since it was
+        last collected. Without a budget it's never collected automatically,
+        so call ``gc.collect()`` at a quiet moment, like a loading screen.
+
+        The garbage collector is shared by the whole process, so this affects
+        everything running in it until the game is closed. This attribute is
+        mutable.
+        """
+        return self._gc_mode
+    @gc_mode.setter
+    def gc_mode(self, other):
+        if other == "manual":
+            gc.disable()
+        elif other == "auto":
+            if self._gc_mode == "manual":
+                gc.enable()
+        else:
+            raise ValueError("unknown gc mode %r" % (other,))
+        if other == "manual" and self._gc_mode != "manual":
+            # The only time the oldest generation is counted, since it means
+            # walking all of it. It's usually done once, while loading.
+            self._gc_long_lived = len(gc.get_objects(2))
+            self._gc_pending = 0
+        self._gc_mode = other
+        self._gc_manual[0] = other == "manual"
+
+    @property
+    def gc_budget(self):
+        """The number of seconds a frame may take and still run a full gc.
+
+        Collecting the oldest generation examines every object in it, so it's
+        the only collection long enough to matter. It's only done in frames
+        that finished with time to spare, when ``gc_mode`` is ``"manual"``.
+        None means ``frame_budget`` is used instead. This attribute is
+        mutable.
+        """
+        return self._gc_budget
+    @gc_budget.setter
+    def gc_budget(self, other):
+        self._gc_budget = other
+
+    @property
+    def pick_topmost(self):
+        """A boolean that is True if the mouse only picks the topmost object.
+
+        Normally every object under the mouse gets on_mouse_enter and
+        on_mouse_down. When this is True, the objects under the mouse are
+        ordered from the highest ``z`` down, and only the ones up to the
+        first whose ``blocks_input`` is True receive the mouse events.
+
+        Objects are walked from the highest ``z`` down and the walk stops at
+        that first blocking hit, so objects beneath it are never tested. Each
+        object's own ``bounds`` is checked before its ``__contains__`` is
+        called. Subtrees aren't pruned by ``subtree_bounds`` in this mode.
+        With ``entities``, the world still tests every entity in one pass
+        and only its hits are ordered by ``z``.
+
+        This attribute is mutable.
+        """
+        return self._pick_topmost
+    @pick_topmost.setter
+    def pick_topmost(self, other):
+        self._pick_topmost = other
+        if other:
+            objects = sorted(self._objects.values(), key=self._z_key)
+            self._z_keys = [self._z_key(obj) for obj in objects]
+            self._z_objects = objects
+        else:
+            self._z_keys = []
+            self._z_objects = []
+
+    @property
+    def frame_allocations(self):
+        """The net number of objects tracked by gc created in the last frame.
+
+        This is the number of container objects (lists, dicts, instances and
+        so on) allocated minus the number freed, as counted by gc.
+        Collections during the frame reset gc's counts, so this is only exact
+        when ``gc_mode`` is ``"manual"``.
+        """
+        return self._frame_allocations
+
+    @property
+    def gc_pause(self):
+        """The time in seconds spent collecting garbage in the last frame."""
+        return self._gc_pause
+
+    @property
+    def shed_updates(self):
+        """The number of low-priority updates skipped in the last frame."""
+        return self._shed_updates
+
+    @property
+    def frame_time(self):
+        """The average time in seconds taken by a frame.
+
+        This is only measured while the game has a ``render_scale``.
+        """
+        return self._frame_time
+
+    @property
+    def sounds(self):
+        """The :class:`audio.SoundManager` used to load and play sounds.
+
+        It's created the first time it's used. Load sounds while setting up
+        the game, and only play them from event handlers.
+        """
+        if self._sounds is None:
+            self._sounds = SoundManager(self._sound_channels)
+        return self._sounds
+
+    @property
+    def world(self):
+        """The :class:`entities.World` storing this game's objects, or None.
+
+        This is None unless the game was created with ``entities=True``.
+
+        Its arrays hold the screen position and shape of every object. They
+        are brought up to date before update is called, at the end of every
+        step, and whenever this attribute is read, so a system can iterate
+        them directly from update.
+        """
+        if self._stale:
+            self._sync_world()
+        return self._world
+
 class GameObject(object):
 
     """A simple class to (hopefully) make pygame more intuitive.
@@ -329,20 +1187,51 @@ class GameObject(object):
     Intializing a GameObject modifies internal data in the Game it's
     instantiated by.
 
+    GameObjects can be attached to each other to form a tree. An object's
+    ``position`` is relative to its parent, so moving a parent moves all of
+    its children with it.
+
+    The ``schema`` class attribute lists the attributes that make up an
+    object's state, as (name, format) pairs where format is a
+    :mod:`struct` format such as ``"d"`` or ``"2d"``. Formats with more than
+    one value are for tuple attributes. It's used to send objects over the
+    network and to take snapshots, and is empty for a plain GameObject.
+
     Public Methods:
 
         | update, on_mouse_enter, on_mouse_exit, on_mouse_stay, on_mouse_down,
-        | on_mouse_up, on_mouse_drag, move
+        | on_mouse_up, on_mouse_drag, on_key_down, on_key_up,
+        | on_joy_button_down, on_joy_button_up, subscribe_key,
+        | unsubscribe_key, subscribe_joy_button, unsubscribe_joy_button,
+        | add_child, remove_child, move
 
     Instance Variables:
 
-        | game, ID
+        | game, ID, priority, z, blocks_input, parent, children, position,
+        | world_position, bounds, subtree_bounds
 
     """
 
+    schema = ()
+
     def __init__(self, game):
         self._game = game
         self._contains_mouse = False
+        self._keys = set()
+        self._joy_buttons = set()
+
+        self._priority = 0
+        self._served = 0
+        self._z = 0
+        self._blocks_input = True
+
+        self._parent = None
+        self._children = {}
+        self._position = (0, 0)
+        self._world_position = (0, 0)
+        self._dirty = False
+        self._bounds_dirty = True
+        self._subtree_bounds = None
 
         self._id = game.add_object(self)
 
@@ -471,10 +1360,310 @@ class GameObject(object):
         """
         pass
 
+    def on_key_down(self, event):
+        """This method is called when a subscribed key is pressed.
+
+        *event* is a pygame ``KEYDOWN`` event. It contains the event
+        attributes ``unicode``, ``key``, and ``mod``.
+
+        Only keys passed to subscribe_key are delivered to this method.
+
+        This method is not predefined.
+        """
+        pass
+
+    def on_key_up(self, event):
+        """This method is called when a subscribed key is released.
+
+        *event* is a pygame ``KEYUP`` event. It contains the event
+        attributes ``key`` and ``mod``.
+
+        Only keys passed to subscribe_key are delivered to this method.
+
+        This method is not predefined.
+        """
+        pass
+
+    def on_joy_button_down(self, event):
+        """This method is called when a subscribed joystick button is pressed.
+
+        *event* is a pygame ``JOYBUTTONDOWN`` event. It contains the event
+        attributes ``joy`` and ``button``.
+
+        Only buttons passed to subscribe_joy_button are delivered to this
+        method.
+
+        This method is not predefined.
+        """
+        pass
+
+    def on_joy_button_up(self, event):
+        """This method is called when a subscribed joystick button is released.
+
+        *event* is a pygame ``JOYBUTTONUP`` event. It contains the event
+        attributes ``joy`` and ``button``.
+
+        Only buttons passed to subscribe_joy_button are delivered to this
+        method.
+
+        This method is not predefined.
+        """
+        pass
+
+    def subscribe_key(self, *keys):
+        """Receive on_key_down and on_key_up calls for each of *keys*."""
+        for key in keys:
+            self.game.subscribe_key(self, key)
+
+    def unsubscribe_key(self, *keys):
+        """Stop receiving on_key_down and on_key_up calls for *keys*."""
+        for key in keys:
+            self.game.unsubscribe_key(self, key)
+
+    def subscribe_joy_button(self, *buttons, joy=None):
+        """Receive joystick button calls for each of *buttons*.
+
+        *joy* is the id of the joystick to listen to. If it's None, the
+        buttons of every joystick are received.
+        """
+        for button in buttons:
+            self.game.subscribe_joy_button(self, button, joy)
+
+    def unsubscribe_joy_button(self, *buttons, joy=None):
+        """Stop receiving joystick button calls for *buttons*."""
+        for button in buttons:
+            self.game.unsubscribe_joy_button(self, button, joy)
+
+    def add_child(self, other):
+        """Make the GameObject *other* a child of this object.
+
+        The child keeps its ``position``, which is now relative to this
+        object's ``world_position``.
+        """
+        other.parent = self
+
+    def remove_child(self, other):
+        """Detach the child *other* so that it becomes a top-level object."""
+        if other.parent is self:
+            other.parent = None
+
+    def move(self, rel):
+        """Move this object and all of its children.
+
+        *rel* is a 2-tuple of numbers representing the change in x and y
+        coordinates.
+        """
+        x, y = self._position
+        dx, dy = rel
+        self.position = x+dx, y+dy
+
     def destroy(self):
-        """Deletes this object from the game world."""
+        """Deletes this object and its children from the game world."""
         self.game.destroy_object(self.ID)
 
+    def _invalidate(self):
+        # The world positions of this subtree are stale. Subtrees that are
+        # already dirty don't need to be walked again.
+        if self._dirty:
+            return
+        self._dirty = True
+        self._invalidate_bounds()
+        self._mark_stale()
+        for child in self._children.values():
+            child._invalidate()
+
+    def _mark_stale(self):
+        stale = self._game._stale
+        if stale is not None:
+            stale[self._id] = self
+
+    def _shape(self):
+        return SHAPE_NONE, 0, 0
+
+    def _invalidate_bounds(self):
+        # A change in this object's extent changes the subtree bounds of
+        # every ancestor.
+        obj = self
+        while obj is not None and not obj._bounds_dirty:
+            obj._bounds_dirty = True
+            obj = obj._parent
+
+    @property
+    def priority(self):
+        """An integer representing how important this object's update is.
+
+        Objects with a priority of 0 or more are updated every frame. Objects
+        with a negative priority are updated after them, most important first,
+        and only while the game is within its ``frame_budget``.
+
+        This attribute is mutable.
+        """
+        return self._priority
+    @priority.setter
+    def priority(self, other):
+        if other != self._priority:
+            self.game._set_priority(self, self._priority, other)
+            self._priority = other
+
+    @property
+    def z(self):
+        """A number representing how high this object is stacked.
+
+        Objects with a higher z are above objects with a lower z. Among
+        objects with the same z, the most recently created one is on top. It
+        only matters when the game's ``pick_topmost`` is True.
+
+        This attribute is mutable.
+        """
+        return self._z
+    @z.setter
+    def z(self, other):
+        if self.game._pick_topmost:
+            self.game._unstack(self)
+            self._z = other
+            self.game._stack(self)
+        else:
+            self._z = other
+
+    @property
+    def blocks_input(self):
+        """A boolean that is True if this object hides objects below it.
+
+        When the game's ``pick_topmost`` is True, objects below an object that
+        blocks input don't receive mouse events where they overlap it.
+
+        This attribute is mutable.
+        """
+        return self._blocks_input
+    @blocks_input.setter
+    def blocks_input(self, other):
+        self._blocks_input = other
+
+    @property
+    def parent(self):
+        """The GameObject this object is attached to, or None.
+
+        Setting this attaches the object to a new parent. The object keeps its
+        local ``position``.
+        """
+        return self._parent
+    @parent.setter
+    def parent(self, other):
+        if other is self._parent:
+            return
+        ancestor = other
+        while ancestor is not None:
+            if ancestor is self:
+                raise ValueError("a GameObject can't be its own ancestor")
+            ancestor = ancestor._parent
+
+        if self._parent is None:
+            del self.game._roots[self.ID]
+        else:
+            del self._parent._children[self.ID]
+            self._parent._invalidate_bounds()
+
+        self._parent = other
+        if other is None:
+            self.game._roots[self.ID] = self
+        else:
+            other._children[self.ID] = self
+            other._invalidate_bounds()
+        self._invalidate()
+
+    @property
+    def children(self):
+        """A tuple of the GameObjects attached to this object.
+
+        This attribute is immutable.
+        """
+        return tuple(self._children.values())
+
+    @property
+    def position(self):
+        """A 2-tuple of numbers representing this object's local position.
+
+        The position is relative to the ``world_position`` of this object's
+        parent. If the object has no parent, it's in screen coordinates.
+
+        Setting this will move all of the object's children with it.
+        """
+        return self._position
+    @position.setter
+    def position(self, other):
+        self._position = tuple(other)
+        self._invalidate()
+
+    @property
+    def world_position(self):
+        """A 2-tuple of numbers representing this object's screen position.
+
+        This is cached and only recomputed after this object or one of its
+        ancestors has moved.
+
+        This attribute is immutable.
+        """
+        if self._dirty:
+            x, y = self._position
+            if self._parent is not None:
+                px, py = self._parent.world_position
+                x, y = x+px, y+py
+            self._world_position = x, y
+            self._dirty = False
+        return self._world_position
+
+    @property
+    def bounds(self):
+        """The bounding box of this object in screen coordinates, or None.
+
+        A 4-tuple of numbers representing the left, top, right and bottom
+        edges of the object. A plain GameObject has no hitmask, so it's used
+        as a group and its box is the box around its children (an empty box,
+        with left greater than right, if it has none). None means the
+        object's extent is unknown, so hit-testing can't skip it: that's the
+        case for a subclass that defines ``__contains__`` without overriding
+        ``bounds``.
+
+        This attribute is immutable.
+        """
+        if type(self).__contains__ is not GameObject.__contains__:
+            return None
+        return self.subtree_bounds
+
+    def _own_bounds(self):
+        # The box of this object alone, not counting its children.
+        if type(self).bounds is not GameObject.bounds:
+            return self.bounds
+        if type(self).__contains__ is not GameObject.__contains__:
+            return None
+        return _EMPTY
+
+    @property
+    def subtree_bounds(self):
+        """The bounding box of this object and all of its descendants.
+
+        A 4-tuple like ``bounds``, or None if any object in the subtree has
+        unknown bounds. This is cached and only recomputed after something in
+        the subtree has moved or changed size.
+
+        This attribute is immutable.
+        """
+        if self._bounds_dirty:
+            box = self._own_bounds()
+            for child in self._children.values():
+                other = child.subtree_bounds
+                if box is None or other is None:
+                    box = None
+                else:
+                    box = (min(box[0], other[0]), min(box[1], other[1]),
+                           max(box[2], other[2]), max(box[3], other[3]))
+            self._subtree_bounds = box
+            self._bounds_dirty = False
+        return self._subtree_bounds
+
+    def __contains__(self, other):
+        return False
+
     @property
     def game(self):
         """The pygtails.Game object that this object is a part of."""
@@ -492,7 +1681,8 @@ class Circle(GameObject):
     *game* is the Game this object is a part of.
 
     *corner* is a 2-tuple of integers representing the x and y coordinates of
-    the upper-left corner of the bounding square of circle.
+    the upper-left corner of the bounding square of circle. If the circle has
+    a parent, these coordinates are relative to the parent's position.
 
     *radius* is a numeric value representing the radius of the circle.
 
@@ -502,33 +1692,38 @@ class Circle(GameObject):
     Public Methods:
 
         | update, on_mouse_enter, on_mouse_exit, on_mouse_stay, on_mouse_down,
-        | on_mouse_up, on_mouse_drag, move
+        | on_mouse_up, on_mouse_drag, on_key_down, on_key_up,
+        | on_joy_button_down, on_joy_button_up, subscribe_key,
+        | unsubscribe_key, subscribe_joy_button, unsubscribe_joy_button,
+        | add_child, remove_child, move
 
     Instance Variables:
 
-        | game, ID, center, corner, radius
+        | game, ID, priority, z, blocks_input, parent, children, position,
+        | world_position, bounds, subtree_bounds, center, corner, radius,
+        | world_center, world_corner
 
     """
 
+    schema = (("corner", "2d"), ("radius", "d"))
+
     def __init__(self, game, corner, radius):
         super().__init__(game)
-        x, y = corner
-        self._corner = corner
-        self._center = x+radius, y+radius
         self._radius = radius
+        self.position = corner
 
     @property
     def corner(self):
-        """A 2-tuple of integers representing the center of the circle.
+        """A 2-tuple of integers representing the corner of the circle.
+
+        This is the same as the circle's ``position``, relative to its parent.
 
         Setting this will change the ``corner`` and ``center`` attributes.
         """
-        return self._corner
+        return self._position
     @corner.setter
     def corner(self, other):
-        x, y = other
-        self._corner = other
-        self._center = x+self.radius, y+self.radius
+        self.position = other
 
     @property
     def radius(self):
@@ -539,27 +1734,62 @@ class Circle(GameObject):
         return self._radius
     @radius.setter
     def radius(self, other):
-        self._center = (self._x+radius, self._y+radius)
-        self._radius = radius
+        self._radius = other
+        self._invalidate_bounds()
+        self._mark_stale()
 
     @property
     def center(self):
         """A 2-tuple of integers representing the center of the circle.
 
+        The coordinates are relative to the circle's parent.
+
         Setting this will change the ``center`` and ``corner`` attributes.
         """
-        return self._center
+        x, y = self._position
+        return x+self.radius, y+self.radius
     @center.setter
     def center(self, other):
         x, y = other
-        corner = x-self.radius, y-self.radius
-        self._corner = corner
+        self.position = x-self.radius, y-self.radius
+
+    @property
+    def world_corner(self):
+        """The corner of the circle in screen coordinates.
+
+        This attribute is immutable.
+        """
+        return self.world_position
+
+    @property
+    def world_center(self):
+        """The center of the circle in screen coordinates.
+
+        This attribute is immutable.
+        """
+        x, y = self.world_position
+        return x+self.radius, y+self.radius
+
+    @property
+    def bounds(self):
+        """The bounding square of the circle in screen coordinates.
 
-        self._center = other
+        This attribute is immutable.
+        """
+        x, y = self.world_position
+        diameter = 2*self.radius
+        return x, y, x+diameter, y+diameter
+
+    def _shape(self):
+        # A subclass with its own __contains__ is tested by calling it.
+        if type(self).__contains__ is not Circle.__contains__:
+            return SHAPE_NONE, 0, 0
+        diameter = 2*self.radius
+        return SHAPE_CIRCLE, diameter, diameter
 
     def __contains__(self, other):
         otherx, othery = other
-        x, y = self.center
+        x, y = self.world_center
         return self.radius**2 >= (x-otherx)**2 + (y-othery)**2
 
 class Rectangle(GameObject):
@@ -568,7 +1798,8 @@ class Rectangle(GameObject):
     *game* is the Game this object is a part of.
 
     *corner* is a 2-tuple of integers representing the x and y coordinates of
-    the upper-left corner of the rectangle.
+    the upper-left corner of the rectangle. If the rectangle has a parent,
+    these coordinates are relative to the parent's position.
 
     *width* is an integer representing the width of the rectangle.
 
@@ -580,36 +1811,41 @@ class Rectangle(GameObject):
     Public Methods:
 
         | update, on_mouse_enter, on_mouse_exit, on_mouse_stay, on_mouse_down,
-        | on_mouse_up, on_mouse_drag, move
+        | on_mouse_up, on_mouse_drag, on_key_down, on_key_up,
+        | on_joy_button_down, on_joy_button_up, subscribe_key,
+        | unsubscribe_key, subscribe_joy_button, unsubscribe_joy_button,
+        | add_child, remove_child, move
 
     Instance Variables:
 
-        | game, ID, corner, width, height
+        | game, ID, priority, z, blocks_input, parent, children, position,
+        | world_position, bounds, subtree_bounds, corner, width, height,
+        | world_corner, corners
     
     """
 
+    schema = (("corner", "2d"), ("width", "d"), ("height", "d"))
+
     def __init__(self, game, corner, width, height):
         super().__init__(game)
-        self._corner = corner
-        x, y = corner
         self._width = width
         self._height = height
-        self._corners = ((x,y), (x+width,y), (x+width,y+height), (x,y+height))
+        self.position = corner
 
     @property
     def corner(self):
         """The upper left corner of the rectangle.
 
         A 2-tuple of integers that represent the x and y coordinates of
-        the upper-left corner of the rectangle.
+        the upper-left corner of the rectangle, relative to its parent. This
+        is the same as the rectangle's ``position``.
 
         This attribute is mutable.
         """
-        return self._corner
+        return self._position
     @corner.setter
     def corner(self, other):
-        x, y = other
-        self._corner = other
+        self.position = other
 
     @property
     def width(self):
@@ -621,6 +1857,8 @@ class Rectangle(GameObject):
     @width.setter
     def width(self, other):
         self._width = other
+        self._invalidate_bounds()
+        self._mark_stale()
 
     @property
     def height(self):
@@ -632,6 +1870,16 @@ class Rectangle(GameObject):
     @height.setter
     def height(self, other):
         self._height = other
+        self._invalidate_bounds()
+        self._mark_stale()
+
+    @property
+    def world_corner(self):
+        """The upper left corner of the rectangle in screen coordinates.
+
+        This attribute is immutable.
+        """
+        return self.world_position
 
     @property
     def corners(self):
@@ -639,18 +1887,35 @@ class Rectangle(GameObject):
         
         A 2-dimensional tuple, where the inner tuples are 2-tuples of integers
         representing the x and y coordinates of the different corners of the
-        rectangle.
+        rectangle in screen coordinates.
 
         The order that the points appear are top-left, top-right, bottom-right,
         bottom-left.
 
         This attribute is immutable.
         """
-        return self._corners
+        x, y = self.world_position
+        width, height = self.width, self.height
+        return ((x,y), (x+width,y), (x+width,y+height), (x,y+height))
+
+    @property
+    def bounds(self):
+        """The bounding box of the rectangle in screen coordinates.
+
+        This attribute is immutable.
+        """
+        x, y = self.world_position
+        return x, y, x+self.width, y+self.height
+
+    def _shape(self):
+        # A subclass with its own __contains__ is tested by calling it.
+        if type(self).__contains__ is not Rectangle.__contains__:
+            return SHAPE_NONE, 0, 0
+        return SHAPE_RECT, self.width, self.height
 
     def __contains__(self, other):
         otherx, othery = other
-        x, y = self.corner
+        x, y = self.world_position
         contains = (x <= otherx <= x+self.width and
                     y <= othery <= y+self.height)
 
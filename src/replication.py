@@ -0,0 +1,404 @@
+"""Send the state of GameObjects to other games over UDP.
+
+ReplicationServer   sends delta-compressed snapshots of registered objects.
+ReplicationClient   receives snapshots and mirrors them onto local replicas.
+
+Only the fields listed in each class's ``schema`` are sent. Every snapshot
+is encoded against the last snapshot the client acknowledged, so fields
+that haven't changed since then cost nothing. Lost packets are recovered
+the same way: the next snapshot is simply encoded against an older
+baseline.
+"""
+
+import socket
+import struct
+import time
+
+from collections import OrderedDict, deque
+
+_HEADER = struct.Struct("!IIH")
+_ENTRY = struct.Struct("!IBH")
+_COUNT = struct.Struct("!H")
+_NET_ID = struct.Struct("!I")
+_ACK = struct.Struct("!I")
+
+_MAX_PACKET = 65507
+
+_fields = {}
+
+def _compile(cls):
+    # A list of (name, Struct, is_tuple) for each field in cls.schema.
+    fields = _fields.get(cls)
+    if fields is None:
+        fields = [(name, struct.Struct("!"+fmt), len(struct.unpack(
+                      "!"+fmt, bytes(struct.calcsize("!"+fmt)))) > 1)
+                  for name, fmt in cls.schema]
+        _fields[cls] = fields
+    return fields
+
+def _entry_size(obj):
+    # The most bytes obj can take in a snapshot: a full entry, plus its net
+    # id in the list of removals.
+    return (_ENTRY.size + sum(st.size for name, st, is_tuple
+                              in _compile(type(obj))) + _NET_ID.size)
+
+def _pack(obj):
+    return tuple(st.pack(*getattr(obj, name)) if is_tuple
+                 else st.pack(getattr(obj, name))
+                 for name, st, is_tuple in _compile(type(obj)))
+
+class ReplicationServer(object):
+
+    """Sends the state of registered GameObjects to every client.
+
+    *address* is the (host, port) to listen on. It defaults to an unused
+    port on the loopback interface.
+
+    *history* is the number of recent snapshots kept as baselines. A client
+    that hasn't acknowledged any of them gets a full snapshot.
+
+    *timeout* is the number of ticks a client may go without acknowledging
+    a snapshot. After that it's dropped, so a client that went away, or
+    an address that only ever sent one datagram, stops being sent
+    snapshots. A client that comes back is treated as a new one.
+
+    Every snapshot has to fit in one UDP datagram, so register raises
+    ValueError instead of registering an object that could make a snapshot
+    too big.
+
+    Call tick once per frame, for example from Game.update.
+
+    Public Methods:
+
+        | register, unregister, tick, poll, disconnect, close
+
+    Instance variables:
+
+        | address, clients
+
+    """
+
+    def __init__(self, address=("127.0.0.1", 0), history=32, timeout=60):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(address)
+        self._sock.setblocking(False)
+
+        self._history = history
+        self._timeout = timeout
+        self._snapshots = OrderedDict()
+        self._seq = 0
+        self._clients = {}
+        self._heard = {}
+
+        self._next_id = 1
+        self._objects = {}
+
+        # The largest packet the registered objects could need, and the
+        # ticks at which objects were unregistered, since their ids are sent
+        # as removals for as long as a baseline might still contain them.
+        self._packet_size = _HEADER.size + _COUNT.size
+        self._removals = deque()
+
+    def register(self, other, kind=0):
+        """Start replicating the GameObject *other* and return its net id.
+
+        *kind* is an integer from 0 to 255 that tells clients which factory
+        to create the replica with.
+
+        Raises ValueError if a snapshot with *other* in it might not fit in
+        one packet.
+        """
+        while self._removals and self._removals[0] <= self._seq-self._history:
+            self._removals.popleft()
+        size = _entry_size(other)
+        largest = (self._packet_size + size +
+                   _NET_ID.size * len(self._removals))
+        if largest > _MAX_PACKET:
+            raise ValueError("snapshots with %r could take %d bytes, which "
+                             "doesn't fit in a packet" % (other, largest))
+        self._packet_size += size
+
+        net_id = self._next_id
+        self._next_id += 1
+        self._objects[net_id] = (other, kind)
+        other._net_id = net_id
+        return net_id
+
+    def unregister(self, other):
+        """Stop replicating *other*. Clients destroy their replica."""
+        del self._objects[other._net_id]
+        del other._net_id
+        self._packet_size -= _entry_size(other)
+        self._removals.append(self._seq)
+
+    def poll(self):
+        """Read acknowledgements and new clients from the socket."""
+        while True:
+            try:
+                data, address = self._sock.recvfrom(_ACK.size)
+            except (BlockingIOError, InterruptedError):
+                return
+            if len(data) != _ACK.size:
+                continue
+            seq, = _ACK.unpack(data)
+            if seq != 0 and seq not in self._snapshots:
+                continue
+            self._heard[address] = self._seq
+            if seq > self._clients.get(address, -1):
+                self._clients[address] = seq
+
+    def disconnect(self, address):
+        """Stop sending snapshots to the client at *address*.
+
+        Raises KeyError if there is no such client.
+        """
+        del self._clients[address]
+        del self._heard[address]
+
+    def tick(self):
+        """Take a snapshot, send it to every client and return its number."""
+        self.poll()
+        self._seq += 1
+        snapshot = {net_id: (kind, _pack(obj))
+                    for net_id, (obj, kind) in self._objects.items()}
+        self._snapshots[self._seq] = snapshot
+        while len(self._snapshots) > self._history:
+            self._snapshots.popitem(last=False)
+
+        for address, heard in tuple(self._heard.items()):
+            if self._seq - heard > self._timeout:
+                self.disconnect(address)
+
+        for address, acked in self._clients.items():
+            baseline = self._snapshots.get(acked)
+            if baseline is None:
+                acked, baseline = 0, {}
+            packet = self._encode(self._seq, acked, baseline, snapshot)
+            self._sock.sendto(packet, address)
+        return self._seq
+
+    def _encode(self, seq, acked, baseline, snapshot):
+        entries = []
+        count = 0
+        for net_id, (kind, fields) in snapshot.items():
+            old = baseline.get(net_id)
+            if old is not None and old[0] != kind:
+                old = None
+            mask = 0
+            changed = []
+            for i, field in enumerate(fields):
+                if old is None or old[1][i] != field:
+                    mask |= 1 << i
+                    changed.append(field)
+            if mask:
+                entries.append(_ENTRY.pack(net_id, kind, mask))
+                entries.extend(changed)
+                count += 1
+        removed = [net_id for net_id in baseline if net_id not in snapshot]
+
+        packet = b"".join([_HEADER.pack(seq, acked, count)] + entries +
+                          [_COUNT.pack(len(removed))] +
+                          [_NET_ID.pack(net_id) for net_id in removed])
+        if len(packet) > _MAX_PACKET:
+            raise ValueError("snapshot of %d bytes doesn't fit in a packet"
+                             % len(packet))
+        return packet
+
+    def close(self):
+        """Close the server's socket."""
+        self._sock.close()
+
+    @property
+    def address(self):
+        """The (host, port) the server is listening on."""
+        return self._sock.getsockname()
+
+    @property
+    def clients(self):
+        """A tuple of the addresses of the connected clients."""
+        return tuple(self._clients)
+
+class ReplicationClient(object):
+
+    """Mirrors the objects of a ReplicationServer onto local replicas.
+
+    *game* is the Game the replicas are created in.
+
+    *address* is the (host, port) of the server.
+
+    *factories* is a mapping from the *kind* given to
+    ReplicationServer.register to a function that takes *game* and returns
+    a new replica. A replica must be of the same class as the object on the
+    server, so that their schemas match.
+
+    *delay* is the number of seconds the replicas are shown behind the most
+    recent snapshot. Replicas are interpolated between the two snapshots
+    around that time, which hides jitter and lost packets.
+
+    *retry* is the number of seconds without a snapshot after which the
+    client says hello to the server again, in case it was dropped.
+
+    Call poll and then interpolate once per frame.
+
+    Public Methods:
+
+        | poll, interpolate, close
+
+    Instance variables:
+
+        | replicas
+
+    """
+
+    def __init__(self, game, address, factories, delay=0.1, buffered=32,
+                 retry=1.0):
+        self._game = game
+        self._factories = factories
+        self._delay = delay
+        self._buffered = buffered
+        self._retry = retry
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.connect(address)
+        self._sock.setblocking(False)
+
+        self._seq = 0
+        self._snapshots = {0: {}}
+        self._timeline = []
+        self._replicas = {}
+        self._kinds = {}
+
+        self._heard = time.perf_counter()
+        self._sock.send(_ACK.pack(0))
+
+    def poll(self):
+        """Read new snapshots from the server and acknowledge them."""
+        while True:
+            try:
+                data = self._sock.recv(_MAX_PACKET)
+            except (BlockingIOError, InterruptedError, ConnectionError):
+                break
+            snapshot = self._decode(data)
+            if snapshot is None:
+                continue
+            self._heard = time.perf_counter()
+            self._timeline.append((self._heard, snapshot))
+            del self._timeline[:-self._buffered]
+            self._sock.send(_ACK.pack(self._seq))
+
+        # A server that dropped this client only answers a new hello, which
+        # it encodes against the empty snapshot 0 that's always kept.
+        if time.perf_counter() - self._heard > self._retry:
+            self._heard = time.perf_counter()
+            try:
+                self._sock.send(_ACK.pack(0))
+            except ConnectionError:
+                pass
+
+    def _decode(self, data):
+        seq, acked, count = _HEADER.unpack_from(data)
+        baseline = self._snapshots.get(acked)
+        if seq <= self._seq or baseline is None:
+            return None
+
+        snapshot = dict(baseline)
+        offset = _HEADER.size
+        for _ in range(count):
+            net_id, kind, mask = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            old = snapshot.get(net_id)
+            fields = list(old[1]) if old is not None and old[0] == kind else []
+            for i, (name, st, is_tuple) in enumerate(
+                    self._schema(net_id, kind)):
+                if mask & 1 << i:
+                    field = data[offset:offset+st.size]
+                    offset += st.size
+                    if i < len(fields):
+                        fields[i] = field
+                    else:
+                        fields.append(field)
+            snapshot[net_id] = (kind, tuple(fields))
+        removed, = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        for _ in range(removed):
+            net_id, = _NET_ID.unpack_from(data, offset)
+            offset += _NET_ID.size
+            snapshot.pop(net_id, None)
+
+        # The server only encodes against snapshots it has seen acknowledged,
+        # so anything older than this baseline will never be needed again.
+        # The empty snapshot 0 is always kept: the server falls back to it
+        # when our last acknowledgement has left its history.
+        self._snapshots = {s: v for s, v in self._snapshots.items()
+                           if s >= acked or s == 0}
+        self._snapshots[seq] = snapshot
+        self._seq = seq
+        return snapshot
+
+    def _schema(self, net_id, kind):
+        # Replicas are created as soon as they are first received, since the
+        # class of the replica is what tells us how to decode its fields.
+        replica = self._replicas.get(net_id)
+        if replica is None or self._kinds[net_id] != kind:
+            if replica is not None:
+                replica.destroy()
+            replica = self._replicas[net_id] = self._factories[kind](
+                self._game)
+            self._kinds[net_id] = kind
+        return _compile(type(replica))
+
+    def interpolate(self, now=None):
+        """Move the replicas to where they were *delay* seconds ago.
+
+        *now* is a time from ``time.perf_counter``. It defaults to the
+        current time.
+
+        Replicas are created when an object is first received and destroyed
+        once it's missing from the most recent snapshot.
+        """
+        if not self._timeline:
+            return
+        if now is None:
+            now = time.perf_counter()
+        target = now - self._delay
+
+        timeline = self._timeline
+        i = len(timeline) - 1
+        while i > 0 and timeline[i][0] > target:
+            i -= 1
+        time0, old = timeline[i]
+        if i+1 < len(timeline):
+            time1, new = timeline[i+1]
+            alpha = min(1.0, max(0.0, (target-time0) / (time1-time0)))
+        else:
+            new, alpha = old, 0.0
+
+        latest = timeline[-1][1]
+        for net_id in tuple(self._replicas):
+            if net_id not in latest:
+                self._replicas.pop(net_id).destroy()
+                del self._kinds[net_id]
+
+        for net_id, (kind, fields) in new.items():
+            replica = self._replicas.get(net_id)
+            if replica is None or self._kinds[net_id] != kind:
+                continue
+            before = old.get(net_id)
+            if before is not None and before[0] != kind:
+                before = None
+            for i, (name, st, is_tuple) in enumerate(_compile(type(replica))):
+                value = st.unpack(fields[i])
+                if before is not None and alpha < 1.0:
+                    start = st.unpack(before[1][i])
+                    value = tuple(a + (b-a)*alpha if isinstance(b, float)
+                                  else b for a, b in zip(start, value))
+                setattr(replica, name, value if is_tuple else value[0])
+
+    def close(self):
+        """Close the client's socket. The replicas are left in the game."""
+        self._sock.close()
+
+    @property
+    def replicas(self):
+        """A dict mapping net ids to the local replicas."""
+        return dict(self._replicas)
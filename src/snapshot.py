@@ -0,0 +1,143 @@
+"""Save and restore the state of GameObjects for quick-saves and rollback.
+
+SnapshotRing    keeps the most recent snapshots of a set of objects.
+
+Each object's state is the fields listed in its class's ``schema``. A
+snapshot packs them all into one preallocated buffer, and restoring one
+sets them back on the same objects, so neither allocates objects.
+"""
+
+import struct
+
+_layouts = {}
+
+def _layout(cls):
+    # (Struct, [(name, count)]) for cls.schema, with every field packed
+    # back to back in native byte order.
+    layout = _layouts.get(cls)
+    if layout is None:
+        st = struct.Struct("=" + "".join(fmt for name, fmt in cls.schema))
+        fields = [(name, len(struct.unpack("="+fmt,
+                                           bytes(struct.calcsize("="+fmt)))))
+                  for name, fmt in cls.schema]
+        layout = _layouts[cls] = st, fields
+    return layout
+
+class SnapshotRing(object):
+
+    """Keeps the last *capacity* snapshots of the registered objects.
+
+    *capacity* is an integer representing how many snapshots are kept.
+    Saving a new snapshot once the ring is full overwrites the oldest one.
+
+    Objects are registered with register. Any object with a ``schema`` can be
+    registered, including a Game subclass that declares one. Registering or
+    unregistering an object clears the ring, since the old snapshots no
+    longer match the layout of the buffer.
+
+    Public Methods:
+
+        | register, unregister, save, restore, clear
+
+    Instance variables:
+
+        | capacity, frames, size
+
+    """
+
+    def __init__(self, capacity=8):
+        self._capacity = capacity
+        self._objects = []
+        self._frame = 0
+        self._relayout()
+
+    def register(self, other):
+        """Include *other* in future snapshots."""
+        self._objects.append(other)
+        self._relayout()
+
+    def unregister(self, other):
+        """Leave *other* out of future snapshots."""
+        self._objects.remove(other)
+        self._relayout()
+
+    def _relayout(self):
+        self._entries = []
+        offset = 0
+        for obj in self._objects:
+            st, fields = _layout(type(obj))
+            self._entries.append((obj, st, fields, offset))
+            offset += st.size
+        self._size = offset
+        self._buffers = [bytearray(offset) for _ in range(self._capacity)]
+        self.clear()
+
+    def save(self):
+        """Take a snapshot of every registered object and return its frame.
+
+        The frame is an integer that increases with every snapshot.
+        """
+        self._frame += 1
+        slot = self._frame % self._capacity
+        buf = self._buffers[slot]
+        for obj, st, fields, offset in self._entries:
+            values = []
+            for name, count in fields:
+                if count == 1:
+                    values.append(getattr(obj, name))
+                else:
+                    values.extend(getattr(obj, name))
+            st.pack_into(buf, offset, *values)
+        self._frames[slot] = self._frame
+        return self._frame
+
+    def restore(self, frame=None):
+        """Set every registered object back to its state in a snapshot.
+
+        *frame* is a frame returned by save. It defaults to the most recent
+        snapshot. Raises KeyError if the snapshot is no longer in the ring.
+
+        Snapshots taken after *frame* are discarded, so that saving again
+        continues from the restored state.
+        """
+        if frame is None:
+            frame = self._frame
+        slot = frame % self._capacity
+        if frame <= 0 or self._frames[slot] != frame:
+            raise KeyError(frame)
+
+        buf = self._buffers[slot]
+        for obj, st, fields, offset in self._entries:
+            values = st.unpack_from(buf, offset)
+            i = 0
+            for name, count in fields:
+                if count == 1:
+                    setattr(obj, name, values[i])
+                else:
+                    setattr(obj, name, values[i:i+count])
+                i += count
+
+        for later in range(frame+1, self._frame+1):
+            if self._frames[later % self._capacity] == later:
+                self._frames[later % self._capacity] = None
+        self._frame = frame
+
+    def clear(self):
+        """Forget every snapshot."""
+        self._frames = [None] * self._capacity
+
+    @property
+    def capacity(self):
+        """An integer representing how many snapshots are kept."""
+        return self._capacity
+
+    @property
+    def frames(self):
+        """A sorted tuple of the frames of the snapshots in the ring."""
+        return tuple(sorted(frame for frame in self._frames
+                            if frame is not None))
+
+    @property
+    def size(self):
+        """An integer representing the size of one snapshot in bytes."""
+        return self._size
@@ -0,0 +1,256 @@
+"""Run many headless pygtails games in parallel.
+
+VecGame     steps N Game instances across a pool of worker processes.
+"""
+
+import os
+import multiprocessing
+import signal
+import weakref
+
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+
+_STEP, _RESET, _CLOSE = range(3)
+
+def _worker(conn, make_game, start, stop, shm_name, size, typecode):
+    # Games are created inside the worker, so they never need to be pickled.
+    # Every worker writes the observations of its own games straight into the
+    # shared buffer and only sends a short acknowledgement back.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    from pygame.event import Event
+
+    shm = SharedMemory(name=shm_name)
+    buf = shm.buf.cast(typecode)
+    try:
+        try:
+            games = [make_game() for _ in range(start, stop)]
+        except Exception as e:
+            conn.send(e)
+            return
+        # pygame.init makes SDL turn SIGTERM into a QUIT event, which would
+        # stop Process.terminate from ending the worker.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        conn.send(None)
+
+        def observe(i, game):
+            observation = array(typecode, game.observe())
+            if len(observation) != size:
+                raise ValueError("%s.observe() returned %d values, expected %d"
+                                 % (type(game).__name__, len(observation),
+                                    size))
+            offset = (start+i) * size
+            buf[offset:offset+size] = observation
+
+        while True:
+            command, arg = conn.recv()
+            try:
+                if command == _STEP:
+                    for i, (game, events) in enumerate(zip(games, arg)):
+                        game.step([Event(t, d) for t, d in events])
+                        observe(i, game)
+                elif command == _RESET:
+                    for i, game in enumerate(games):
+                        if arg is None or start+i in arg:
+                            game.reset()
+                            observe(i, game)
+                else:
+                    break
+            except Exception as e:
+                conn.send(e)
+            else:
+                conn.send(None)
+    finally:
+        buf.release()
+        shm.close()
+        conn.close()
+
+def _shutdown(conns, procs, shm, views):
+    for conn in conns:
+        try:
+            conn.send((_CLOSE, None))
+        except OSError:
+            pass
+    for proc in procs:
+        proc.join(1)
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(1)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+    for conn in conns:
+        conn.close()
+
+    for view in views:
+        view.release()
+    try:
+        shm.close()
+    except BufferError:
+        # Someone still holds a view of the buffer. It's freed along with
+        # that view, but the name can still be unlinked now.
+        pass
+    shm.unlink()
+
+class VecGame(object):
+
+    """Steps several headless Game instances in parallel.
+
+    *make_game* is a callable that takes no arguments and returns a new
+    Game. It's called inside the worker processes, so it must be picklable
+    (a module-level function or a Game subclass). Each game's ``observe``
+    method must return *size* numbers.
+
+    *n* is an integer representing the number of games to run.
+
+    *size* is an integer representing the length of a single observation.
+
+    *typecode* is an :mod:`array` typecode for the observation values. It
+    defaults to ``"d"`` (double).
+
+    *processes* is the number of worker processes to spread the games across.
+    It defaults to the number of CPUs.
+
+    Observations are written by the workers into a single shared-memory
+    buffer, so a step only sends events to the workers and never copies
+    observations between processes. Workers use SDL's dummy video driver
+    unless ``SDL_VIDEODRIVER`` is already set.
+
+    Public Methods:
+
+        | step, reset, close
+
+    Instance variables:
+
+        | n, size, observations
+
+    """
+
+    def __init__(self, make_game, n, size, typecode="d", processes=None):
+        self._n = n
+        self._size = size
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = max(1, min(processes, n))
+
+        itemsize = array(typecode).itemsize
+        self._shm = SharedMemory(create=True, size=max(1, n*size*itemsize))
+        self._buf = self._shm.buf.cast(typecode)
+        self._observations = self._buf[:n*size]
+        self._rows = tuple(self._observations[i*size:(i+1)*size]
+                           for i in range(n))
+
+        self._conns = []
+        self._procs = []
+        self._slices = []
+        # The workers and the shared buffer are cleaned up when the VecGame
+        # is garbage collected or the interpreter exits, even without close.
+        self._finalizer = weakref.finalize(
+            self, _shutdown, self._conns, self._procs, self._shm,
+            list(self._rows) + [self._observations, self._buf])
+        try:
+            self._start(make_game, n, size, typecode, processes)
+            self._wait()
+            self.reset()
+        except BaseException:
+            self.close()
+            raise
+
+    def _start(self, make_game, n, size, typecode, processes):
+        per_proc, extra = divmod(n, processes)
+        start = 0
+        for i in range(processes):
+            stop = start + per_proc + (i < extra)
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(
+                target=_worker, daemon=True,
+                args=(child, make_game, start, stop, self._shm.name, size,
+                      typecode))
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+            self._slices.append((start, stop))
+            start = stop
+
+    def step(self, events=None):
+        """Run a single frame of every game and return the observations.
+
+        *events* is a sequence of *n* iterables of pygame events, one for each
+        game. If it's None, no events are handled this frame.
+
+        Returns a tuple of *n* memoryviews into the shared observation buffer.
+        They are overwritten by the next step or reset; copy them to keep them.
+        """
+        if events is None:
+            events = [()] * self._n
+        elif len(events) != self._n:
+            raise ValueError("expected events for %d games, got %d"
+                             % (self._n, len(events)))
+
+        for conn, (start, stop) in zip(self._conns, self._slices):
+            batch = [[(e.type, e.dict) for e in game_events]
+                     for game_events in events[start:stop]]
+            conn.send((_STEP, batch))
+        self._wait()
+        return self._rows
+
+    def reset(self, indices=None):
+        """Reset games and return the observations.
+
+        *indices* is an iterable of the indices of the games to reset. If it's
+        None, every game is reset.
+
+        Returns the same tuple of memoryviews as step.
+        """
+        if indices is not None:
+            indices = frozenset(indices)
+        for conn in self._conns:
+            conn.send((_RESET, indices))
+        self._wait()
+        return self._rows
+
+    def close(self):
+        """Stop the worker processes and free the shared buffer.
+
+        The observations returned by step and reset can't be used afterwards.
+        """
+        self._rows = ()
+        self._finalizer()
+
+    def _wait(self):
+        errors = []
+        for conn in self._conns:
+            try:
+                errors.append(conn.recv())
+            except EOFError:
+                errors.append(RuntimeError("a VecGame worker exited"))
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def n(self):
+        """An integer representing the number of games being run."""
+        return self._n
+
+    @property
+    def size(self):
+        """An integer representing the length of a single observation."""
+        return self._size
+
+    @property
+    def observations(self):
+        """A flat memoryview of every game's observation, in order.
+
+        It's backed by shared memory, so it can be wrapped without copying
+        (for example with ``numpy.frombuffer``). This attribute is immutable.
+        """
+        return self._observations
@@ -0,0 +1,58 @@
+"""Tests for atlas.AtlasBuilder and atlas.Atlas."""
+
+import random
+
+import pygame
+import pytest
+
+from atlas import Atlas, AtlasBuilder
+
+def image(width, height, color):
+    surface = pygame.Surface((width, height), pygame.SRCALPHA)
+    surface.fill(color)
+    return surface
+
+def build(sizes, page_size=(64, 64), padding=1):
+    builder = AtlasBuilder()
+    for i, (width, height) in enumerate(sizes):
+        builder.add("img%d" % i, image(width, height, (i % 256, 0, 0, 255)))
+    return builder.build(page_size, padding)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_regions_fit_and_never_overlap(seed):
+    rng = random.Random(seed)
+    sizes = [(rng.randint(1, 30), rng.randint(1, 30)) for _ in range(60)]
+    atlas = build(sizes)
+    assert len(atlas) == len(sizes)
+    for page in atlas.pages:
+        assert page.get_width() == 64 and page.get_height() <= 64
+
+    regions = [atlas[name] for name in atlas.names]
+    for i, region in enumerate(regions):
+        page = atlas.pages[region.page]
+        assert page.get_rect().contains(region.rect)
+        width, height = sizes[int(atlas.names[i][3:])]
+        assert region.rect.size == (width, height)
+        for other in regions[i+1:]:
+            if other.page == region.page:
+                assert not region.rect.inflate(1, 1).colliderect(other.rect)
+
+def test_pixels_are_copied():
+    atlas = build([(4, 4), (8, 2)])
+    assert atlas["img1"].surface.get_at((7, 1)) == (1, 0, 0, 255)
+    target = pygame.Surface((10, 10), pygame.SRCALPHA)
+    atlas.blit(target, "img0", (2, 2))
+    assert target.get_at((2, 2)) == (0, 0, 0, 255)
+
+def test_images_too_big_for_a_page_are_refused():
+    with pytest.raises(ValueError):
+        build([(64, 10)])
+
+def test_save_and_load(tmp_path):
+    atlas = build([(5, 5), (3, 9)])
+    atlas.save(str(tmp_path))
+    loaded = Atlas.load(str(tmp_path))
+    assert set(loaded.names) == set(atlas.names)
+    for name in atlas.names:
+        assert loaded[name].rect == atlas[name].rect
+        assert loaded[name].page == atlas[name].page
@@ -0,0 +1,34 @@
+"""Tests for audio.SoundManager and the mixer settings of pygtails.Game."""
+
+import pygame
+import pytest
+
+from audio import SoundManager
+from pygtails import Game
+
+@pytest.fixture(autouse=True)
+def fresh_mixer():
+    pygame.mixer.quit()
+    yield
+    pygame.mixer.quit()
+
+def test_sound_format_is_used():
+    Game((10, 10), "audio", sound_buffer=256, sound_format=(22050, -16, 1))
+    assert pygame.mixer.get_init() == (22050, -16, 1)
+
+def test_earlier_pre_init_is_kept_without_a_buffer():
+    pygame.mixer.pre_init(22050, -16, 1)
+    Game((10, 10), "audio", sound_buffer=None)
+    assert pygame.mixer.get_init() == (22050, -16, 1)
+
+def test_initialized_mixer_warns():
+    pygame.mixer.init(22050, -16, 1)
+    with pytest.warns(UserWarning):
+        Game((10, 10), "audio", sound_buffer=256)
+    assert pygame.mixer.get_init() == (22050, -16, 1)
+
+def test_sound_channels_reach_the_manager():
+    game = Game((10, 10), "audio", sound_channels=4)
+    if not game.sounds.enabled:
+        pytest.skip("no audio device")
+    assert pygame.mixer.get_num_channels() == 4
@@ -0,0 +1,97 @@
+"""Tests for entities.World and the games that store their objects in one."""
+
+import pygame
+import pytest
+
+from pygame.event import Event
+
+from entities import World, SHAPE_NONE, SHAPE_CIRCLE, SHAPE_RECT
+from pygtails import Game, Circle, Rectangle
+
+def test_destroy_moves_the_last_entity_into_the_gap():
+    world = World()
+    a, b, c = world.create(), world.create(), world.create()
+    world.set_position(c, (3, 4))
+    world.set_flags(c, 7)
+    world.destroy(a)
+    assert world.handles == (c, b)
+    assert world.position(c) == (3, 4)
+    assert world.flags(c) == 7
+    assert tuple(world.x) == (3, 0) and len(world) == 2
+
+def test_stale_handles_never_match_reused_slots():
+    world = World()
+    old = world.create()
+    world.destroy(old)
+    new = world.create()
+    assert new & 0xffffffff == old & 0xffffffff
+    assert new != old
+    assert not world.alive(old) and old not in world
+    assert world.alive(new)
+    for method in (world.destroy, world.position, world.flags):
+        with pytest.raises(KeyError):
+            method(old)
+    with pytest.raises(KeyError):
+        world.destroy(new + 1)
+
+def test_hit_test_matches_shapes():
+    world = World()
+    rect, circle, custom = world.create(), world.create(), world.create()
+    world.set_shape(rect, SHAPE_RECT, 10, 5)
+    world.set_position(circle, (20, 0))
+    world.set_shape(circle, SHAPE_CIRCLE, 10, 10)
+    world.set_shape(custom, SHAPE_NONE)
+    assert world.hit_test((5, 5)) == [rect]
+    assert world.hit_test((25, 5)) == [circle]
+    assert world.hit_test((21, 1)) == []
+    assert world.hit_test((0, 0), lambda handle: handle == custom) == [
+        rect, custom]
+
+@pytest.fixture
+def game():
+    return Game((100, 100), "entities", entities=True)
+
+def test_world_follows_objects_every_step(game):
+    circle = Circle(game, (5, 5), 3)
+    circle.move((10, 0))
+    game.step([])
+    slot = game.world.handles.index(circle.ID)
+    assert (game.world.x[slot], game.world.y[slot]) == (15, 5)
+    assert game.world.shape(circle.ID) == (SHAPE_CIRCLE, 6, 6)
+
+def test_update_sees_current_world(game):
+    seen = []
+    class Mover(Rectangle):
+        def update(self):
+            seen.append(self.game.world.position(self.ID))
+            self.move((1, 1))
+    mover = Mover(game, (0, 0), 4, 4)
+    mover.move((2, 2))
+    game.step([])
+    game.step([])
+    assert seen == [(2, 2), (3, 3)]
+    assert game.world.position(mover.ID) == (4, 4)
+    assert game.world.shape(mover.ID) == (SHAPE_RECT, 4, 4)
+
+@pytest.mark.parametrize("entities", [False, True])
+def test_overridden_contains_is_called(entities):
+    game = Game((100, 100), "entities", entities=entities)
+    entered = []
+    class Ring(Circle):
+        def __contains__(self, pos):
+            x, y = self.world_center
+            distance = ((pos[0]-x)**2 + (pos[1]-y)**2) ** 0.5
+            return self.radius/2 <= distance <= self.radius
+        def on_mouse_enter(self, event):
+            entered.append(event.pos)
+    class Hollow(Rectangle):
+        def __contains__(self, pos):
+            return False
+        def on_mouse_enter(self, event):
+            entered.append(self)
+    Ring(game, (0, 0), 20)
+    Hollow(game, (0, 0), 40, 40)
+    for pos in ((20, 20), (20, 2), (30, 30)):
+        game.on_mouse_move(Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0),
+                                 buttons=(0, 0, 0)))
+    assert entered == [(20, 2)]
@@ -0,0 +1,48 @@
+"""Tests for the manual garbage collection schedule of pygtails.Game."""
+
+import gc
+
+import pytest
+
+from pygtails import Game
+
+@pytest.fixture
+def game():
+    game = Game((100, 100), "gc", gc_mode="manual", gc_budget=1.0)
+    yield game
+    game.close()
+
+def test_idle_collection_never_walks_the_heap(game, monkeypatch):
+    full = []
+    def count_full(phase, info):
+        if phase == "start" and info["generation"] == 2:
+            full.append(info)
+    walks = []
+    get_objects = gc.get_objects
+    def spy(*args, **kwargs):
+        walks.append(args)
+        return get_objects(*args, **kwargs)
+    monkeypatch.setattr(gc, "get_objects", spy)
+    gc.callbacks.append(count_full)
+
+    # Objects that survive into the oldest generation, plus garbage cycles,
+    # so every generation crosses its threshold over and over.
+    kept = []
+    try:
+        for _ in range(300):
+            for _ in range(2000):
+                cycle = []
+                cycle.append(cycle)
+                kept.append([])
+            game.step([])
+    finally:
+        gc.callbacks.remove(count_full)
+
+    assert walks == []
+    assert full, "the oldest generation was never collected"
+
+def test_close_restores_gc(game):
+    assert not gc.isenabled()
+    game.close()
+    assert gc.isenabled()
+    assert game.gc_mode == "auto"
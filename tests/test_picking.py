@@ -0,0 +1,66 @@
+"""Tests for mouse picking with pygtails.Game.pick_topmost."""
+
+import pygame
+import pytest
+
+from pygame.event import Event
+
+from pygtails import Game, Rectangle
+
+def motion(pos):
+    return Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+
+def click(pos):
+    return Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+class Counted(Rectangle):
+    calls = 0
+
+    def __init__(self, game, log=None):
+        super().__init__(game, (0, 0), 50, 50)
+        self.log = log
+
+    def __contains__(self, pos):
+        Counted.calls += 1
+        return super().__contains__(pos)
+
+    def on_mouse_enter(self, event):
+        self.log.append(("enter", self))
+
+    def on_mouse_exit(self, event):
+        self.log.append(("exit", self))
+
+    def on_mouse_down(self, event):
+        self.log.append(("down", self))
+
+@pytest.mark.parametrize("pick_topmost, calls", [(True, 1), (False, 200)])
+def test_topmost_stops_at_first_blocking_hit(pick_topmost, calls):
+    game = Game((100, 100), "picking", pick_topmost=pick_topmost)
+    stack = [Counted(game, []) for _ in range(200)]
+    Counted.calls = 0
+    game.on_mouse_move(motion((10, 10)))
+    assert Counted.calls == calls
+    if pick_topmost:
+        assert list(game._contains_mouse.values()) == [stack[-1]]
+
+def test_topmost_skips_objects_out_of_bounds():
+    game = Game((100, 100), "picking", pick_topmost=True)
+    below = Counted(game, [])
+    above = Counted(game, [])
+    above.position = (60, 60)
+    Counted.calls = 0
+    game.on_mouse_move(motion((10, 10)))
+    assert Counted.calls == 1
+    assert list(game._contains_mouse.values()) == [below]
+
+def test_click_after_restack_enters_before_down():
+    game = Game((100, 100), "picking", pick_topmost=True)
+    log = []
+    below = Counted(game, log)
+    above = Counted(game, log)
+    game.on_mouse_move(motion((10, 10)))
+    below.z = 1
+    game.on_mouse_down(click((10, 10)))
+    assert log == [("enter", above), ("exit", above), ("enter", below),
+                   ("down", below)]
+    assert list(game._clicked.values()) == [below]
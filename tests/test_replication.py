@@ -0,0 +1,196 @@
+"""Loopback tests for replication.ReplicationServer and ReplicationClient."""
+
+import socket
+import time
+
+import pytest
+
+from pygtails import Game, Circle, Rectangle
+from replication import (ReplicationServer, ReplicationClient, _ACK, _ENTRY,
+                         _HEADER)
+
+FACTORIES = {0: lambda game: Circle(game, (0, 0), 1),
+             1: lambda game: Rectangle(game, (0, 0), 1, 1)}
+
+@pytest.fixture
+def game():
+    return Game((100, 100), "replication")
+
+@pytest.fixture
+def server():
+    server = ReplicationServer(history=4)
+    yield server
+    server.close()
+
+def receive(sock):
+    # Wait for the next packet on a blocking socket.
+    sock.settimeout(1.0)
+    try:
+        return sock.recv(65535)
+    finally:
+        sock.setblocking(False)
+
+def wait_for(client):
+    # Poll until the client has decoded a new snapshot.
+    seq = client._seq
+    deadline = time.perf_counter() + 1.0
+    while client._seq == seq:
+        assert time.perf_counter() < deadline, "no snapshot arrived"
+        client.poll()
+    client.interpolate(float("inf"))
+
+def test_sends_only_changed_fields(game, server):
+    circle = Circle(game, (1, 2), 3)
+    server.register(circle, 0)
+    server.register(Rectangle(game, (5, 5), 10, 10), 1)
+
+    peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    peer.connect(server.address)
+    try:
+        peer.send(_ACK.pack(0))
+        time.sleep(0.01)
+        server.tick()
+        seq, acked, count = _HEADER.unpack_from(receive(peer))
+        assert (acked, count) == (0, 2)
+
+        peer.send(_ACK.pack(seq))
+        time.sleep(0.01)
+        server.tick()
+        seq, acked, count = _HEADER.unpack_from(receive(peer))
+        assert count == 0
+
+        circle.radius = 4
+        peer.send(_ACK.pack(seq))
+        time.sleep(0.01)
+        server.tick()
+        data = receive(peer)
+        seq, acked, count = _HEADER.unpack_from(data)
+        net_id, kind, mask = _ENTRY.unpack_from(data, _HEADER.size)
+        assert (count, net_id, kind, mask) == (1, circle._net_id, 0, 0b10)
+    finally:
+        peer.close()
+
+def test_replicas_follow_server(game, server):
+    circle = Circle(game, (1, 2), 3)
+    rectangle = Rectangle(game, (5, 5), 10, 10)
+    server.register(circle, 0)
+    server.register(rectangle, 1)
+    client = ReplicationClient(game, server.address, FACTORIES, delay=0)
+    try:
+        time.sleep(0.01)
+        server.tick()
+        wait_for(client)
+        replica = client.replicas[circle._net_id]
+        assert (replica.corner, replica.radius) == ((1, 2), 3)
+
+        circle.corner = (50, 60)
+        server.unregister(rectangle)
+        server.tick()
+        wait_for(client)
+        assert replica.corner == (50, 60)
+        assert list(client.replicas) == [circle._net_id]
+    finally:
+        client.close()
+
+def test_recovers_after_baseline_leaves_history(game, server):
+    circle = Circle(game, (1, 2), 3)
+    server.register(circle, 0)
+    client = ReplicationClient(game, server.address, FACTORIES, delay=0)
+    try:
+        time.sleep(0.01)
+        server.tick()
+        wait_for(client)
+        server.tick()
+        wait_for(client)
+
+        # Lose every packet until the acknowledged snapshot is forgotten, so
+        # the server has to send a full snapshot against snapshot 0.
+        time.sleep(0.01)
+        for _ in range(5):
+            server.tick()
+            receive(client._sock)
+        circle.corner = (7, 8)
+        server.tick()
+        wait_for(client)
+        assert client.replicas[circle._net_id].corner == (7, 8)
+
+        circle.corner = (9, 10)
+        server.tick()
+        wait_for(client)
+        assert client.replicas[circle._net_id].corner == (9, 10)
+    finally:
+        client.close()
+
+def test_silent_clients_are_dropped(game):
+    server = ReplicationServer(timeout=3)
+    peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    peer.connect(server.address)
+    try:
+        server.register(Circle(game, (1, 2), 3), 0)
+        peer.send(_ACK.pack(0))
+        time.sleep(0.01)
+        server.tick()
+        assert server.clients == (peer.getsockname(),)
+        for _ in range(4):
+            server.tick()
+        assert server.clients == ()
+
+        peer.send(_ACK.pack(0))
+        time.sleep(0.01)
+        server.poll()
+        server.disconnect(peer.getsockname())
+        assert server.clients == ()
+        with pytest.raises(KeyError):
+            server.disconnect(peer.getsockname())
+    finally:
+        peer.close()
+        server.close()
+
+def test_dropped_client_says_hello_again(game):
+    server = ReplicationServer(timeout=2)
+    circle = Circle(game, (1, 2), 3)
+    server.register(circle, 0)
+    client = ReplicationClient(game, server.address, FACTORIES, delay=0,
+                               retry=0.05)
+    try:
+        time.sleep(0.01)
+        server.tick()
+        wait_for(client)
+        for _ in range(4):
+            server.tick()
+        assert server.clients == ()
+
+        time.sleep(0.1)
+        client.poll()
+        time.sleep(0.01)
+        circle.corner = (7, 8)
+        server.tick()
+        wait_for(client)
+        assert client.replicas[circle._net_id].corner == (7, 8)
+    finally:
+        client.close()
+        server.close()
+
+def test_register_refuses_objects_that_overflow_a_packet(game, server):
+    circles = []
+    with pytest.raises(ValueError):
+        while True:
+            circle = Circle(game, (len(circles), 0), 1)
+            server.register(circle, 0)
+            circles.append(circle)
+    assert len(circles) > 1000
+
+    # A full snapshot of everything that was registered still fits, even
+    # while the ids of unregistered objects are being sent as removals.
+    for _ in range(3):
+        server.unregister(circles.pop())
+    server.register(Rectangle(game, (0, 0), 1, 1), 1)
+    peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    peer.connect(server.address)
+    try:
+        peer.send(_ACK.pack(0))
+        time.sleep(0.01)
+        server.tick()
+        assert len(receive(peer)) <= 65507
+    finally:
+        peer.close()
@@ -0,0 +1,75 @@
+"""Tests for the scene graph of pygtails.GameObject and mouse hit-testing."""
+
+import random
+
+import pytest
+
+from pygtails import Game, GameObject, Circle, Rectangle
+
+def brute_force(game, pos):
+    return {obj_id for obj_id, obj in game._objects.items() if pos in obj}
+
+def test_moving_a_parent_moves_its_children():
+    game = Game((100, 100), "scene")
+    group = GameObject(game)
+    child = Rectangle(game, (5, 5), 10, 10)
+    child.parent = group
+    group.move((20, 30))
+    assert child.position == (5, 5)
+    assert child.world_position == (25, 35)
+    assert group.subtree_bounds == (25, 35, 35, 45)
+
+    child.parent = None
+    assert child.world_position == (5, 5)
+    assert group.subtree_bounds[0] == float("inf")
+
+def test_parent_cycles_are_refused():
+    game = Game((100, 100), "scene")
+    a, b = GameObject(game), GameObject(game)
+    b.parent = a
+    with pytest.raises(ValueError):
+        a.parent = b
+
+@pytest.mark.parametrize("entities", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_hit_testing_matches_brute_force(entities, seed):
+    # Build a random tree, then keep moving, reparenting and destroying
+    # objects and check every hit-test against testing every object.
+    rng = random.Random(seed)
+    game = Game((200, 200), "scene", entities=entities)
+    objects = []
+    def spawn():
+        kind = rng.random()
+        corner = rng.uniform(0, 150), rng.uniform(0, 150)
+        if kind < 0.2:
+            obj = GameObject(game)
+            obj.position = corner
+        elif kind < 0.6:
+            obj = Circle(game, corner, rng.uniform(1, 30))
+        else:
+            obj = Rectangle(game, corner, rng.uniform(1, 40),
+                            rng.uniform(1, 40))
+        if objects and rng.random() < 0.7:
+            obj.parent = rng.choice(objects)
+        objects.append(obj)
+
+    for _ in range(40):
+        spawn()
+    for _ in range(200):
+        action = rng.random()
+        obj = rng.choice(objects)
+        if action < 0.4:
+            obj.move((rng.uniform(-20, 20), rng.uniform(-20, 20)))
+        elif action < 0.6:
+            parent = rng.choice(objects + [None])
+            try:
+                obj.parent = parent
+            except ValueError:
+                pass
+        elif action < 0.7 and len(objects) > 10:
+            obj.destroy()
+            objects[:] = [o for o in objects if o.ID in game._objects]
+        elif action < 0.8:
+            spawn()
+        pos = rng.uniform(0, 200), rng.uniform(0, 200)
+        assert set(game._collide(pos)) == brute_force(game, pos)
@@ -0,0 +1,61 @@
+"""Tests for snapshot.SnapshotRing."""
+
+import pytest
+
+from snapshot import SnapshotRing
+
+class Body(object):
+    schema = (("position", "2d"), ("health", "i"))
+
+    def __init__(self, position, health):
+        self.position = position
+        self.health = health
+
+def test_restore_sets_fields_back():
+    body = Body((1.0, 2.0), 10)
+    ring = SnapshotRing(4)
+    ring.register(body)
+    assert ring.size == 20
+    frame = ring.save()
+    body.position, body.health = (5.0, 6.0), 3
+    ring.restore(frame)
+    assert (body.position, body.health) == ((1.0, 2.0), 10)
+
+def test_oldest_snapshots_are_overwritten():
+    body = Body((0.0, 0.0), 0)
+    ring = SnapshotRing(3)
+    ring.register(body)
+    frames = []
+    for health in range(5):
+        body.health = health
+        frames.append(ring.save())
+    assert ring.frames == tuple(frames[-3:])
+    with pytest.raises(KeyError):
+        ring.restore(frames[0])
+    ring.restore(frames[2])
+    assert body.health == 2
+
+def test_restore_discards_later_snapshots():
+    body = Body((0.0, 0.0), 0)
+    ring = SnapshotRing(8)
+    ring.register(body)
+    first = ring.save()
+    body.health = 1
+    later = ring.save()
+    ring.restore(first)
+    with pytest.raises(KeyError):
+        ring.restore(later)
+    body.health = 2
+    assert ring.save() == later
+    ring.restore()
+    assert body.health == 2
+
+def test_registering_clears_the_ring():
+    ring = SnapshotRing(2)
+    ring.register(Body((0.0, 0.0), 0))
+    ring.save()
+    other = Body((1.0, 1.0), 1)
+    ring.register(other)
+    assert ring.frames == ()
+    ring.unregister(other)
+    assert ring.size == 20
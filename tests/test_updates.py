@@ -0,0 +1,72 @@
+"""Tests for the prioritized, budgeted updates of pygtails.Game."""
+
+import pytest
+
+from pygtails import Game, GameObject
+
+class Logged(GameObject):
+
+    def __init__(self, game, log, priority=0, action=None):
+        super().__init__(game)
+        self.log = log
+        self.priority = priority
+        self.action = action
+
+    def update(self):
+        self.log.append(self)
+        if self.action is not None:
+            action, self.action = self.action, None
+            action()
+
+@pytest.fixture
+def game():
+    return Game((100, 100), "updates")
+
+def test_destroying_a_peer_during_update(game):
+    log = []
+    first = Logged(game, log, -1)
+    peer = Logged(game, log, -1)
+    other = Logged(game, log, -2)
+    first.action = lambda: (peer.destroy(), other.destroy())
+    game.step([])
+    assert log == [first]
+
+    log.clear()
+    game.step([])
+    assert log == [first]
+
+def test_changing_priority_during_update(game):
+    log = []
+    first = Logged(game, log, -1)
+    raised = Logged(game, log, -1)
+    lowered = Logged(game, log, -1)
+    def restack():
+        raised.priority = 0
+        lowered.priority = -2
+    first.action = restack
+    game.step([])
+    assert sorted(map(id, log)) == sorted(map(id, (first, lowered)))
+
+    log.clear()
+    game.step([])
+    assert len(log) == 3 and set(map(id, log)) == set(
+        map(id, (first, raised, lowered)))
+
+def test_every_deferred_object_is_served_once(game):
+    log = []
+    objects = [Logged(game, log, -1 - i % 3) for i in range(9)]
+    objects[0].action = lambda: Logged(game, log, -1)
+    game.step([])
+    assert len(log) == len(set(map(id, log))) == 9
+
+def test_shed_updates_resets_once_nothing_is_deferred(game):
+    log = []
+    slow = [Logged(game, log, -1) for _ in range(3)]
+    game.frame_budget = 0.0
+    game.step([])
+    assert game.shed_updates == 3
+
+    for obj in slow:
+        obj.priority = 0
+    game.step([])
+    assert game.shed_updates == 0